@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'urlaubsantrag.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -145,5 +146,50 @@ STATIC_URL = '/static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Holiday lookups are cached in-process (LRU). Invalidations only reach the worker that made
+# the change, other workers keep their entries for up to HOLIDAY_CACHE_TIMEOUT seconds. With
+# several workers set HOLIDAY_CACHE_ALIAS to a shared CACHES alias (e.g. Redis, Memcached or
+# a FileBasedCache) so invalidations apply immediately.
+HOLIDAY_CACHE_SIZE = 256
+HOLIDAY_CACHE_TIMEOUT = 300
+HOLIDAY_CACHE_ALIAS = None
+
+# Rendered calender months can be cached per (year, month, province, department) and are
+# invalidated by signals. The alias must point to a cache shared by all workers (e.g. Redis,
+# Memcached or FileBasedCache): with the per-process LocMemCache other workers would never see
+# an invalidation. Disabled when CALENDER_CACHE_ALIAS is None.
+CALENDER_CACHE_ALIAS = None
+CALENDER_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# The authenticated user (with province and department) can be cached per worker or shared;
+# saving a user, department or province invalidates it. Disabled when USER_CACHE_ALIAS is None.
+USER_CACHE_ALIAS = None
+USER_CACHE_TIMEOUT = 300
+
+# Serve the landing page and the calender with async views (only useful under ASGI, see core/asgi.py).
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
+
+# Opt-in per-request timing: wall, DB and template time, query counts and repeated SQL.
+# Slow requests are logged as JSON to "urlaubsantrag.performance", percentiles per view
+# are available to superusers under /performance/.
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED') == '1'
+INSTRUMENTATION_SLOW_REQUEST_MS = 500
+INSTRUMENTATION_DUPLICATE_QUERY_THRESHOLD = 5
+INSTRUMENTATION_SAMPLE_SIZE = 1000
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'performance': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'urlaubsantrag.performance': {'handlers': ['performance'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/"
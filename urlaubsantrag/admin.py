@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Request
+from .models import Request, VacationBalance, VacationCarryover
 
 # Register your models here.
 
@@ -7,4 +7,18 @@ from .models import Request
 class RequestAdmin(admin.ModelAdmin):
     class Meta:
         model = Request
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+@admin.register(VacationBalance)
+class VacationBalanceAdmin(admin.ModelAdmin):
+    class Meta:
+        model = VacationBalance
+        fields = '__all__'
+
+
+@admin.register(VacationCarryover)
+class VacationCarryoverAdmin(admin.ModelAdmin):
+    class Meta:
+        model = VacationCarryover
+        fields = '__all__'
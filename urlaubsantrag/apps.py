@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class UrlaubsantragConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'urlaubsantrag'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+import time
+
+from django.db import connection
+
+
+@contextmanager
+def benchmark_database():
+    # Benchmarks laufen immer gegen eine Wegwerf-Datenbank, nie gegen die echten Daten
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+@contextmanager
+def measure():
+    result = {"queries": 0, "seconds": 0.0}
+    counter = QueryCounter()
+    start = time.perf_counter()
+
+    with connection.execute_wrapper(counter):
+        yield result
+
+    result["seconds"] = time.perf_counter() - start
+    result["queries"] = counter.count
@@ -0,0 +1,164 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from functools import lru_cache
+import asyncio
+import calendar
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max
+
+from users.holiday_cache import get_holiday_names
+from users.models import StandardHoliday
+from .models import Request
+
+
+day_names = ['MO', 'DI', 'MI', 'DO', 'FR', 'SA', 'SO']
+
+month_names_german = ['Januar', 'Februar', 'März', 'April', 'Mai', 'Juni', 'Juli', 'August', 'September', 'Oktober',
+                      'November', 'Dezember']
+
+
+def get_calender_requests(first_day, last_day, department=None):
+    requests = Request.objects.for_calender(first_day, last_day)
+
+    if department is not None:
+        requests = requests.filter(requested_by__department=department)
+
+    return requests
+
+
+def index_by_day(requests, first_day, last_day):
+    # Jeder Antrag wird genau einmal auf die Tage innerhalb des Zeitraums verteilt
+    entries_by_day = defaultdict(list)
+
+    for request in requests:
+        current_day = max(request.start_date, first_day)
+        end_day = min(request.end_date, last_day)
+
+        while current_day <= end_day:
+            entries_by_day[current_day].append(request)
+            current_day += timedelta(days=1)
+
+    return entries_by_day
+
+
+@lru_cache(maxsize=240)
+def month_weeks(year, month):
+    # Das reine Raster eines Monats hängt nicht von den Daten ab und wird wiederverwendet
+    weeks = []
+    current_week = [None] * 7
+    last_day_number = calendar.monthrange(year, month)[1]
+
+    for day_number in range(1, last_day_number + 1):
+        current_day = date(year, month, day_number)
+        current_week[current_day.weekday()] = current_day
+
+        if current_day.weekday() == 6 or day_number == last_day_number:
+            weeks.append(tuple(current_week))
+            current_week = [None] * 7
+
+    return tuple(weeks)
+
+
+def build_calender_month(year, month, entries_by_day, holidays_by_day):
+    return {
+        "month_name": month_names_german[month - 1],
+        "month_number": month,
+        "weeks": [[build_calender_day(current_day, entries_by_day, holidays_by_day) if current_day else None
+                   for current_day in week]
+                  for week in month_weeks(year, month)],
+    }
+
+
+def build_calender_day(current_day, entries_by_day, holidays_by_day):
+    return {
+        "day_name": day_names[current_day.weekday()],
+        "day_number": current_day.strftime('%d'),
+        "day_date": current_day.strftime('%Y-%m-%d'),
+        "entries": entries_by_day.get(current_day, []),
+        "holiday": holidays_by_day.get(current_day, []),
+    }
+
+
+def calender_range(year, months):
+    return date(year, months[0], 1), date(year, months[-1], calendar.monthrange(year, months[-1])[1])
+
+
+def assemble_calender(year, months, entries_by_day, holidays_by_day):
+    return {
+        "year": year,
+        "day_names": day_names,
+        "months": [build_calender_month(year, month, entries_by_day, holidays_by_day) for month in months],
+    }
+
+
+def build_calender(year, months=None, province=None, country=None, department=None):
+    months = list(months or range(1, 13))
+    first_day, last_day = calender_range(year, months)
+
+    entries_by_day = index_by_day(get_calender_requests(first_day, last_day, department), first_day, last_day)
+    holidays_by_day = get_holiday_names(country, province, year)
+
+    return assemble_calender(year, months, entries_by_day, holidays_by_day)
+
+
+async def abuild_calender(year, months=None, province=None, country=None, department=None):
+    months = list(months or range(1, 13))
+    first_day, last_day = calender_range(year, months)
+
+    # Anträge und Feiertage werden gleichzeitig geladen
+    requests, holidays_by_day = await asyncio.gather(
+        alist(get_calender_requests(first_day, last_day, department)),
+        sync_to_async(get_holiday_names)(country, province, year),
+    )
+
+    return assemble_calender(year, months, index_by_day(requests, first_day, last_day), holidays_by_day)
+
+
+async def alist(queryset):
+    return [item async for item in queryset]
+
+
+def build_calender_year(year, province=None, country=None, department=None):
+    return build_calender(year, province=province, country=country, department=department)
+
+
+def calender_version(year, province=None, country=None, department=None):
+    first_day_of_year = date(year, 1, 1)
+    last_day_of_year = date(year, 12, 31)
+
+    # Anzahl und letzte Änderung erkennen neue, geänderte und gelöschte Einträge
+    requests = get_calender_requests(first_day_of_year, last_day_of_year, department).order_by()
+    request_version = requests.aggregate(count=Count('id'), modified=Max('modified_at'),
+                                         user_modified=Max('requested_by__modified_at'))
+
+    holidays = StandardHoliday.objects.filter(province=province, country=country, date__gte=first_day_of_year, date__lte=last_day_of_year)
+    holiday_version = holidays.aggregate(count=Count('id'), modified=Max('modified_at'))
+
+    return '-'.join(str(part) for part in (
+        year, province, country or '', getattr(department, 'pk', department),
+        request_version['count'], request_version['modified'] and request_version['modified'].timestamp(),
+        # Umbenennungen und Kürzeländerungen der angezeigten Benutzer
+        request_version['user_modified'] and request_version['user_modified'].timestamp(),
+        holiday_version['count'], holiday_version['modified'] and holiday_version['modified'].timestamp(),
+    ))
+
+
+def build_calender_data(year, province=None, country=None, department=None):
+    first_day_of_year = date(year, 1, 1)
+    last_day_of_year = date(year, 12, 31)
+
+    requests = list(get_calender_requests(first_day_of_year, last_day_of_year, department))
+
+    absences = {current_day.isoformat(): [request.pk for request in entries]
+                for current_day, entries in index_by_day(requests, first_day_of_year, last_day_of_year).items()}
+
+    return {
+        "year": year,
+        "users": {request.requested_by_id: request.requested_by.abbreviation for request in requests},
+        "requests": {request.pk: {"user": request.requested_by_id, "start": request.start_date.isoformat(),
+                                  "end": request.end_date.isoformat()} for request in requests},
+        "absences": absences,
+        "holidays": {holiday_date.isoformat(): names
+                     for holiday_date, names in get_holiday_names(country, province, year).items()},
+    }
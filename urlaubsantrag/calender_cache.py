@@ -0,0 +1,172 @@
+from datetime import date
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .calender import abuild_calender, build_calender, day_names, month_names_german
+from .models import Request
+
+
+def get_fragment_cache():
+    alias = getattr(settings, 'CALENDER_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def request_version_key(year, month):
+    return 'calender:requests:%s:%s' % (year, month)
+
+
+def holiday_version_key(province_id, year, month):
+    return 'calender:holidays:%s:%s:%s' % (province_id, year, month)
+
+
+def months_between(first_day, last_day):
+    year, month = first_day.year, first_day.month
+
+    while (year, month) <= (last_day.year, last_day.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def increment_versions(fragment_cache, keys):
+    for key in keys:
+        try:
+            fragment_cache.incr(key)
+        except ValueError:
+            # Zeitbasierte Startversion, damit verdrängte Versionen nicht wieder gültig werden
+            fragment_cache.set(key, time.time_ns(), None)
+
+
+def bump_versions(keys):
+    fragment_cache = get_fragment_cache()
+    if fragment_cache is None:
+        return
+
+    # Erst nach dem Commit: sonst könnte ein gleichzeitiger Aufruf alte Daten unter der neuen Version speichern
+    keys = list(keys)
+    transaction.on_commit(lambda: increment_versions(fragment_cache, keys))
+
+
+def bump_request_months(first_day, last_day):
+    bump_versions(request_version_key(year, month) for year, month in months_between(first_day, last_day))
+
+
+def bump_holiday_months(province_id, first_day, last_day):
+    bump_versions(holiday_version_key(province_id, year, month) for year, month in months_between(first_day, last_day))
+
+
+def get_versions(fragment_cache, keys):
+    versions = fragment_cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+
+    if missing:
+        fragment_cache.set_many(missing, None)
+        versions.update(missing)
+
+    return versions
+
+
+def fragment_key(year, month, province_id, country, department_id, request_version, holiday_version):
+    return 'calender:month:%s:%s:%s:%s:%s:%s:%s' % (year, month, province_id, country, department_id, request_version,
+                                                   holiday_version)
+
+
+def render_month(year, month, department_id):
+    return render_to_string('urlaubsantrag/calender_month.html', {
+        'selected_year': year, 'day_names': day_names, 'month': month, 'department': department_id or '',
+    })
+
+
+def lookup_fragments(year, months, province, country, department_id):
+    fragment_cache = get_fragment_cache()
+    if fragment_cache is None:
+        return None, {}
+
+    request_keys = {month: request_version_key(year, month) for month in months}
+    holiday_keys = {month: holiday_version_key(province, year, month) for month in months}
+    versions = get_versions(fragment_cache, list(request_keys.values()) + list(holiday_keys.values()))
+
+    keys = {month: fragment_key(year, month, province, country, department_id, versions[request_keys[month]],
+                                versions[holiday_keys[month]]) for month in months}
+
+    return keys, fragment_cache.get_many(list(keys.values()))
+
+
+def store_fragments(year, calender, keys, department_id):
+    rendered = {month["month_number"]: render_month(year, month, department_id) for month in calender["months"]}
+
+    if keys is not None:
+        get_fragment_cache().set_many({keys[month]: html for month, html in rendered.items()},
+                                      getattr(settings, 'CALENDER_CACHE_TIMEOUT', None))
+
+    return rendered
+
+
+def collect_months(months, keys, fragments, rendered):
+    return [{"month_name": month_names_german[month - 1], "month_number": month,
+             "html": mark_safe(rendered[month] if month in rendered else fragments[keys[month]])} for month in months]
+
+
+def render_calender_months(year, months=None, province=None, country=None, department=None):
+    months = list(months or range(1, 13))
+    country = str(country or '')
+    department_id = getattr(department, 'pk', department)
+
+    keys, fragments = lookup_fragments(year, months, province, country, department_id)
+
+    # Nur Monate ohne gültiges Fragment werden aus der Datenbank aufgebaut und gerendert
+    missing_months = [month for month in months if keys is None or keys[month] not in fragments]
+    rendered = {}
+    if missing_months:
+        calender = build_calender(year, missing_months, province=province, country=country, department=department)
+        rendered = store_fragments(year, calender, keys, department_id)
+
+    return collect_months(months, keys, fragments, rendered)
+
+
+async def arender_calender_months(year, months=None, province=None, country=None, department=None):
+    months = list(months or range(1, 13))
+    country = str(country or '')
+    department_id = getattr(department, 'pk', department)
+
+    keys, fragments = await sync_to_async(lookup_fragments)(year, months, province, country, department_id)
+
+    missing_months = [month for month in months if keys is None or keys[month] not in fragments]
+    rendered = {}
+    if missing_months:
+        calender = await abuild_calender(year, missing_months, province=province, country=country, department=department)
+        rendered = await sync_to_async(store_fragments)(year, calender, keys, department_id)
+
+    return collect_months(months, keys, fragments, rendered)
+
+
+def bump_request(request, previous_range=None):
+    bump_request_months(request.start_date, request.end_date)
+
+    if previous_range is not None:
+        bump_request_months(*previous_range)
+
+
+def bump_user_requests(user):
+    # Nur Monate mit genehmigten Anträgen des Benutzers zeigen Kürzel, Namen oder Abteilung
+    if get_fragment_cache() is None:
+        return
+
+    months = set()
+    for first_day, last_day in Request.objects.accepted().filter(requested_by=user).values_list('start_date', 'end_date'):
+        months.update(months_between(first_day, last_day))
+
+    bump_versions(request_version_key(year, month) for year, month in sorted(months))
+
+
+def bump_holiday(province_id, holiday_date):
+    bump_holiday_months(province_id, holiday_date, holiday_date)
+
+
+def bump_holiday_years(province_id, years):
+    bump_holiday_months(province_id, date(years[0], 1, 1), date(years[-1], 12, 31))
@@ -0,0 +1,89 @@
+from collections import defaultdict
+from datetime import date
+
+from django.db import transaction
+from django.db.models import OuterRef
+
+from users.models import CustomUser, StandardHoliday
+from .export import chunked
+from .models import Request, VacationCarryover
+from .vacation import carryover_days, update_vacation_balances
+from .workdays import count_workdays, workday_holidays
+
+
+class Carryover:
+    def __init__(self, user_id, province_id, country, days):
+        self.user_id = user_id
+        self.province_id = province_id
+        self.country = country
+        self.days = days
+
+
+def closing_users(year, department_id=None, resume=False):
+    users = CustomUser.objects.all()
+
+    if department_id is not None:
+        users = users.filter(department_id=department_id)
+    if resume:
+        # Bereits geschriebene Überträge eines abgebrochenen Laufs werden übersprungen
+        users = users.exclude(vacation_carryovers__year=year + 1)
+
+    return users
+
+
+def load_workday_holidays(year):
+    # Eine Abfrage für die Feiertage aller Bundesländer statt einer pro Bundesland
+    holiday_dates = defaultdict(list)
+
+    holidays = StandardHoliday.objects.filter(date__gte=date(year, 1, 1), date__lte=date(year, 12, 31))
+    for province_id, country, holiday_date in holidays.values_list('province_id', 'country', 'date'):
+        holiday_dates[(province_id, str(country))].append(holiday_date)
+
+    return {key: workday_holidays(dates) for key, dates in holiday_dates.items()}
+
+
+def calculate_carryovers(users, year, max_days=None):
+    start_of_year = date(year, 1, 1)
+    end_of_year = date(year, 12, 31)
+
+    user_list = {user.pk: user for user in users.only(
+        'province_id', 'country', 'vacation_entitlement').annotate(
+        carryover=carryover_days(OuterRef('pk'), year))}
+    holidays = load_workday_holidays(year)
+
+    taken = defaultdict(int)
+    requests = Request.objects.accepted().in_range(start_of_year, end_of_year).filter(requested_by__in=users)
+    for user_id, start_date, end_date in requests.values_list('requested_by_id', 'start_date', 'end_date'):
+        user = user_list[user_id]
+        taken[user_id] += count_workdays(max(start_date, start_of_year), min(end_date, end_of_year),
+                                         holidays.get((user.province_id, str(user.country or '')), []))
+
+    carryovers = []
+    for user in user_list.values():
+        # manual_vacation_correction gilt in jedem Jahr und wird deshalb nicht mit übertragen
+        days = max(user.vacation_entitlement + user.carryover - taken[user.pk], 0)
+        if max_days is not None:
+            days = min(days, max_days)
+
+        carryovers.append(Carryover(user.pk, user.province_id, str(user.country or ''), days))
+
+    return carryovers
+
+
+def calculate_department_carryovers(year, department_id, max_days=None, resume=False):
+    return calculate_carryovers(closing_users(year, department_id, resume), year, max_days)
+
+
+def write_carryovers(carryovers, year, batch_size=500):
+    target_year = year + 1
+
+    # Jeder Block wird für sich festgeschrieben, ein abgebrochener Lauf kann mit resume fortgesetzt werden
+    for batch in chunked(carryovers, batch_size):
+        with transaction.atomic():
+            VacationCarryover.objects.bulk_create(
+                [VacationCarryover(user_id=carryover.user_id, year=target_year, days=carryover.days) for carryover in batch],
+                update_conflicts=True, unique_fields=['user', 'year'], update_fields=['days', 'modified_at'])
+
+            # Zu jedem Übertrag gehört eine Bilanz, damit die Übersichten ihn ohne weitere Abfrage laden
+            update_vacation_balances([CustomUser(pk=carryover.user_id, province_id=carryover.province_id,
+                                                 country=carryover.country or None) for carryover in batch], target_year)
@@ -0,0 +1,102 @@
+from datetime import date
+from itertools import islice
+import csv
+
+from django.db.models import OuterRef
+
+from users.holiday_cache import get_holiday_dates as get_cached_holiday_dates
+from users.models import CustomUser
+from .models import Request, RequestStatus
+from .vacation import VacationSummary, calculate_balances, carryover_days
+from .workdays import count_workdays, workday_holidays
+
+
+# Semikolon, damit deutsche Tabellenkalkulationen die Spalten direkt erkennen
+csv_delimiter = ';'
+
+request_header = ['Antrag', 'Personalnummer', 'E-Mail', 'Nachname', 'Vorname', 'Abteilung', 'Von', 'Bis', 'Status',
+                  'Arbeitstage']
+
+balance_header = ['Personalnummer', 'E-Mail', 'Nachname', 'Vorname', 'Abteilung', 'Jahr', 'Anspruch', 'Korrektur',
+                  'Übertrag', 'Genommen', 'Beantragt', 'Resturlaub']
+
+
+class Echo:
+    # csv.writer schreibt in dieses Objekt und bekommt die Zeile direkt zurück
+    def write(self, value):
+        return value
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(Echo(), delimiter=csv_delimiter)
+    yield writer.writerow(header)
+
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class HolidayLookup:
+    def __init__(self):
+        self.holidays = {}
+
+    def get(self, province_id, country, year):
+        key = (province_id, str(country or ''), year)
+
+        if key not in self.holidays:
+            self.holidays[key] = workday_holidays(get_cached_holiday_dates(country, province_id, year)) if province_id else []
+
+        return self.holidays[key]
+
+
+def request_rows(requests, chunk_size=2000):
+    holidays = HolidayLookup()
+    statuses = dict(RequestStatus.choices)
+
+    rows = requests.values_list('pk', 'requested_by__staff_nr', 'requested_by__email', 'requested_by__last_name',
+                                'requested_by__first_name', 'requested_by__department__name', 'start_date', 'end_date',
+                                'request_status', 'requested_by__province', 'requested_by__country').order_by('start_date', 'pk')
+
+    for (pk, staff_nr, email, last_name, first_name, department, start_date, end_date, status, province_id,
+         country) in rows.iterator(chunk_size=chunk_size):
+        workdays = sum(count_workdays(max(start_date, date(year, 1, 1)), min(end_date, date(year, 12, 31)),
+                                      holidays.get(province_id, country, year))
+                       for year in range(start_date.year, end_date.year + 1))
+
+        yield [pk, staff_nr, email, last_name, first_name, department or '', start_date.isoformat(), end_date.isoformat(),
+               str(statuses[status]), workdays]
+
+
+def balance_rows(users, year, chunk_size=500):
+    users = users.select_related('department').only(
+        'staff_nr', 'email', 'last_name', 'first_name', 'department__name', 'province_id', 'country',
+        'vacation_entitlement', 'manual_vacation_correction').annotate(
+        carryover=carryover_days(OuterRef('pk'), year)).order_by('pk')
+
+    # Die Bilanzen werden pro Block mit einer Antragsabfrage berechnet, nicht pro Benutzer
+    for chunk in chunked(users.iterator(chunk_size=chunk_size), chunk_size):
+        balances = calculate_balances(chunk, year)
+
+        for user in chunk:
+            summary = VacationSummary(user, year, balances[user.pk]['days_taken'], balances[user.pk]['days_pending'],
+                                     user.carryover)
+
+            yield [user.staff_nr, user.email, user.last_name, user.first_name,
+                   user.department.name if user.department else '', year, summary.entitlement, summary.correction,
+                   summary.carryover, summary.taken, summary.pending, summary.remaining]
+
+
+def export_requests(requests=None, chunk_size=2000):
+    requests = Request.objects.all() if requests is None else requests
+    return stream_csv(request_header, request_rows(requests, chunk_size))
+
+
+def export_balances(year, users=None, chunk_size=500):
+    users = CustomUser.objects.all() if users is None else users
+    return stream_csv(balance_header, balance_rows(users, year, chunk_size))
@@ -2,7 +2,10 @@ from django import forms
 from django.forms import DateInput
 from .models import Request, RequestStatus
 from django.contrib.auth.models import User
-from users.models import CustomUser
+from users.models import CustomUser, Department
+from django.db.models import Q
+from .calender import month_names_german
+from .vacation import load_vacation_summaries, request_workdays_by_year
 
 
 class DateInputWidget(DateInput):
@@ -18,6 +21,40 @@ class CreateRequestForm(forms.ModelForm):
             'end_date': 'Enddatum'
         }
 
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+
+        if not start_date or not end_date:
+            return cleaned_data
+
+        if start_date > end_date:
+            self.add_error('start_date', 'Das Startdatum darf nicht nach dem Enddatum sein!')
+            return cleaned_data
+
+        if self.user is None:
+            return cleaned_data
+
+        # Eine Bereichsabfrage über den Index (Benutzer, Status, Start, Ende)
+        overlapping = Request.objects.filter(requested_by=self.user, request_status__in=[RequestStatus.NEW, RequestStatus.ACCEPTED])
+        if overlapping.in_range(start_date, end_date).exists():
+            raise forms.ValidationError('Im gewählten Zeitraum gibt es bereits einen offenen oder genehmigten Antrag.')
+
+        workdays_by_year = request_workdays_by_year(Request(start_date=start_date, end_date=end_date), self.user)
+        summaries = load_vacation_summaries(self.user, list(workdays_by_year))
+
+        for year, workdays in workdays_by_year.items():
+            if workdays > summaries[year].remaining_after_pending:
+                self.add_error(None, 'Der Antrag umfasst %s Arbeitstage in %s, verfügbar sind nur noch %s Tage.' % (
+                    workdays, year, summaries[year].remaining_after_pending))
+
+        return cleaned_data
+
 
 class CreateUserForm(forms.ModelForm):
     class Meta:
@@ -63,4 +100,109 @@ class ManageRequestForm(forms.ModelForm):
         fields = ['declinement_reason']
         labels = {
             'declinement_reason': 'Ablehnungsgrund',
-        }
\ No newline at end of file
+        }
+
+
+class RequestFilterForm(forms.Form):
+    status = forms.ChoiceField(label='Status', required=False, choices=[('', 'Alle')] + RequestStatus.choices)
+    department = forms.ModelChoiceField(label='Abteilung', required=False, queryset=Department.objects.all(),
+                                        empty_label='Alle')
+    employee = forms.CharField(label='Mitarbeiter', required=False, max_length=60)
+    date_from = forms.DateField(label='Von', required=False, widget=DateInputWidget)
+    date_to = forms.DateField(label='Bis', required=False, widget=DateInputWidget)
+
+    def filter(self, queryset):
+        if not self.is_valid():
+            return queryset
+
+        data = self.cleaned_data
+
+        if data['status']:
+            queryset = queryset.filter(request_status=data['status'])
+        if data['department']:
+            queryset = queryset.filter(requested_by__department=data['department'])
+        if data['employee']:
+            employee = data['employee'].strip()
+            queryset = queryset.filter(Q(requested_by__abbreviation__iexact=employee) |
+                                       Q(requested_by__first_name__icontains=employee) |
+                                       Q(requested_by__last_name__icontains=employee))
+        if data['date_from']:
+            queryset = queryset.filter(end_date__gte=data['date_from'])
+        if data['date_to']:
+            queryset = queryset.filter(start_date__lte=data['date_to'])
+
+        return queryset
+
+
+class UserFilterForm(forms.Form):
+    search = forms.CharField(label='Suche', required=False, max_length=60)
+    department = forms.ModelChoiceField(label='Abteilung', required=False, queryset=Department.objects.all(),
+                                        empty_label='Alle')
+    show_balance = forms.BooleanField(label='Resturlaub anzeigen', required=False)
+
+    def filter(self, queryset):
+        if not self.is_valid():
+            return queryset
+
+        data = self.cleaned_data
+
+        if data['department']:
+            queryset = queryset.filter(department=data['department'])
+        if data['search']:
+            search = data['search'].strip()
+            queryset = queryset.filter(Q(first_name__icontains=search) | Q(last_name__icontains=search) |
+                                       Q(abbreviation__iexact=search) | Q(staff_nr__startswith=search) |
+                                       Q(department__name__icontains=search))
+
+        return queryset
+
+    def wants_balance(self):
+        return self.is_valid() and self.cleaned_data['show_balance']
+
+
+class RequestIdsField(forms.Field):
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return [int(request_id) for request_id in value or []]
+        except (TypeError, ValueError):
+            raise forms.ValidationError('Ungültige Auswahl.')
+
+
+class BulkRequestActionForm(forms.Form):
+    actions = {
+        'approve': RequestStatus.ACCEPTED,
+        'decline': RequestStatus.DENIED,
+    }
+
+    action = forms.ChoiceField(choices=[('approve', 'Genehmigen'), ('decline', 'Ablehnen')])
+    requests = RequestIdsField(error_messages={'required': 'Bitte mindestens einen Antrag auswählen.'})
+
+    def get_status(self):
+        return self.actions[self.cleaned_data['action']]
+
+
+class CalenderFilterForm(forms.Form):
+    period = forms.ChoiceField(label='Zeitraum', required=False, choices=[('', 'Ganzes Jahr')] + [
+        ('Q%s' % quarter, '%s. Quartal' % quarter) for quarter in range(1, 5)
+    ] + [
+        (str(month), month_name) for month, month_name in enumerate(month_names_german, 1)
+    ])
+    department = forms.ModelChoiceField(label='Abteilung', required=False, queryset=Department.objects.all(),
+                                        empty_label='Alle')
+
+    def get_months(self):
+        period = self.cleaned_data['period'] if self.is_valid() else ''
+
+        if not period:
+            return range(1, 13)
+
+        if period.startswith('Q'):
+            quarter = int(period[1:])
+            return range(quarter * 3 - 2, quarter * 3 + 1)
+
+        return [int(period)]
+
+    def get_department(self):
+        return self.cleaned_data['department'] if self.is_valid() else None
@@ -0,0 +1,136 @@
+from datetime import date, timedelta, timezone as dt_timezone
+
+from django.core import signing
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from users.models import CustomUser, StandardHoliday
+from .models import Request
+
+
+def feed_signer(kind):
+    return signing.Signer(salt='urlaubsantrag.feeds.%s' % kind)
+
+
+def feed_token(kind, user):
+    # Auch der Abteilungs-Feed gehört einem Benutzer: mit dessen Schlüssel, Abteilung und Aktivstatus endet er
+    values = [user.department_id, user.pk] if kind == 'department' else [user.pk]
+    return feed_signer(kind).sign(':'.join(str(value) for value in values + [user.feed_key]))
+
+
+def feed_user(kind, token):
+    try:
+        values = feed_signer(kind).unsign(token).split(':')
+        department_id = int(values.pop(0)) if kind == 'department' else None
+        user_pk, feed_key = int(values[0]), values[1]
+    except (signing.BadSignature, ValueError, IndexError):
+        return None
+
+    user = CustomUser.objects.filter(pk=user_pk, is_active=True, feed_key=feed_key).only(
+        'first_name', 'last_name', 'province_id', 'country', 'department_id').first()
+
+    if user is None or (kind == 'department' and user.department_id != department_id):
+        return None
+
+    return user
+
+
+def feed_window(today=None):
+    # Vorjahr bis Folgejahr reicht für Kalender-Abos und hält den Feed klein
+    today = today or date.today()
+    return date(today.year - 1, 1, 1), date(today.year + 1, 12, 31)
+
+
+def feed_requests(first_day, last_day, user=None, department=None):
+    requests = Request.objects.accepted().in_range(first_day, last_day)
+
+    if user is not None:
+        requests = requests.filter(requested_by=user)
+    if department is not None:
+        requests = requests.filter(requested_by__department=department)
+
+    return requests.order_by()
+
+
+def feed_holidays(first_day, last_day, user=None):
+    if user is None or user.province_id is None:
+        return StandardHoliday.objects.none()
+
+    return StandardHoliday.objects.filter(province_id=user.province_id, country=user.country, date__gte=first_day,
+                                          date__lte=last_day).order_by()
+
+
+def feed_version(requests, holidays):
+    # Anzahl und letzte Änderung erkennen neue, geänderte und gelöschte Einträge
+    request_version = requests.aggregate(count=Count('id'), modified=Max('modified_at'))
+    holiday_version = holidays.aggregate(count=Count('id'), modified=Max('modified_at'))
+
+    modified = [value for value in (request_version['modified'], holiday_version['modified']) if value is not None]
+    last_modified = max(modified) if modified else None
+
+    etag = '%s-%s-%s-%s' % (request_version['count'], request_version['modified'] and request_version['modified'].timestamp(),
+                            holiday_version['count'], holiday_version['modified'] and holiday_version['modified'].timestamp())
+
+    return etag, last_modified
+
+
+def escape_text(value):
+    return str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def fold_line(line):
+    # RFC 5545: Zeilen höchstens 75 Oktette, Fortsetzungen beginnen mit einem Leerzeichen
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+
+    parts = []
+    while encoded:
+        size = 75 if not parts else 74
+        while size and (len(encoded) > size and (encoded[size] & 0xC0) == 0x80):
+            size -= 1
+        parts.append(encoded[:size].decode('utf-8'))
+        encoded = encoded[size:]
+
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_timestamp(value):
+    return (value or timezone.now()).astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event_lines(uid, summary, start_date, end_date, modified_at, category):
+    return [
+        'BEGIN:VEVENT',
+        'UID:%s' % uid,
+        'DTSTAMP:%s' % format_timestamp(modified_at),
+        'DTSTART;VALUE=DATE:%s' % start_date.strftime('%Y%m%d'),
+        'DTEND;VALUE=DATE:%s' % (end_date + timedelta(days=1)).strftime('%Y%m%d'),
+        'SUMMARY:%s' % escape_text(summary),
+        'CATEGORIES:%s' % category,
+        'TRANSP:TRANSPARENT',
+        'END:VEVENT',
+    ]
+
+
+def generate_feed(name, requests, holidays, chunk_size=500):
+    yield fold_line('BEGIN:VCALENDAR')
+    yield fold_line('VERSION:2.0')
+    yield fold_line('PRODID:-//Urlaubsantrag//DE')
+    yield fold_line('CALSCALE:GREGORIAN')
+    yield fold_line('X-WR-CALNAME:%s' % escape_text(name))
+
+    # iterator() hält auch bei großen Abteilungen nur einen Block Anträge im Speicher
+    requests = requests.select_related('requested_by').only(
+        'start_date', 'end_date', 'modified_at', 'requested_by__first_name', 'requested_by__last_name')
+    for request in requests.iterator(chunk_size=chunk_size):
+        yield ''.join(fold_line(line) for line in event_lines(
+            'request-%s@urlaubsantrag' % request.pk, 'Urlaub: %s' % request.requested_by.get_full_name(),
+            request.start_date, request.end_date, request.modified_at, 'Urlaub'))
+
+    for holiday in holidays.only('name', 'date', 'modified_at').iterator(chunk_size=chunk_size):
+        yield ''.join(fold_line(line) for line in event_lines(
+            'holiday-%s@urlaubsantrag' % holiday.pk, holiday.name, holiday.date, holiday.date, holiday.modified_at,
+            'Feiertag'))
+
+    yield fold_line('END:VCALENDAR')
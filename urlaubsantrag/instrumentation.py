@@ -0,0 +1,187 @@
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+import json
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+logger = logging.getLogger('urlaubsantrag.performance')
+
+
+class ViewStatistics:
+    def __init__(self, sample_size=1000):
+        self.samples = defaultdict(lambda: deque(maxlen=sample_size))
+        self.lock = threading.Lock()
+
+    def add(self, view_name, record):
+        with self.lock:
+            self.samples[view_name].append(record)
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+    def summary(self):
+        with self.lock:
+            samples = {view_name: list(records) for view_name, records in self.samples.items()}
+
+        return {view_name: summarize_records(records) for view_name, records in sorted(samples.items())}
+
+
+def percentile(values, fraction):
+    # Nächster Rang, reicht für die Übersicht und braucht kein numpy
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def summarize_records(records):
+    summary = {"count": len(records)}
+
+    for field in ('total_ms', 'db_ms', 'template_ms', 'queries'):
+        values = [record[field] for record in records]
+        summary[field] = {"p50": percentile(values, 0.5), "p90": percentile(values, 0.9),
+                          "p99": percentile(values, 0.99), "max": max(values)}
+
+    summary["duplicate_requests"] = sum(1 for record in records if record["duplicates"])
+    return summary
+
+
+view_statistics = ViewStatistics(getattr(settings, 'INSTRUMENTATION_SAMPLE_SIZE', 1000))
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+
+            # Async-Views können Abfragen aus mehreren Threads gleichzeitig melden
+            with self.lock:
+                self.count += 1
+                self.duration += duration
+                # Gleiches SQL mit anderen Parametern ist das typische N+1-Muster
+                self.statements[sql] += 1
+
+    def duplicates(self, threshold):
+        return [{"sql": sql, "count": count} for sql, count in self.statements.most_common() if count >= threshold]
+
+
+# sync_to_async kopiert den Kontext in den Worker-Thread, so landen auch die Abfragen der Async-Views beim Request
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection):
+    # Verbindungen gelten pro Thread, execute_wrapper() im Event-Loop sähe die Abfragen der Worker-Threads nicht
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def install_query_recorder_on_connect(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+class InstrumentationMiddleware:
+    # Unter ASGI würde eine reine Sync-Middleware jede Async-View in einen Thread zwingen
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.slow_request_ms = getattr(settings, 'INSTRUMENTATION_SLOW_REQUEST_MS', 500)
+        self.duplicate_threshold = getattr(settings, 'INSTRUMENTATION_DUPLICATE_QUERY_THRESHOLD', 5)
+
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        recorder, token, start = self.start_request(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+
+        return self.finish_request(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        recorder, token, start = self.start_request(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+
+        return self.finish_request(request, response, recorder, start)
+
+    def start_request(self, request):
+        # Bereits offene Verbindungen dieses Threads, neue erhalten den Wrapper über connection_created
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+        recorder = QueryRecorder()
+        request._template_duration = 0.0
+
+        return recorder, current_recorder.set(recorder), time.perf_counter()
+
+    def finish_request(self, request, response, recorder, start):
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": request.resolver_match.view_name if request.resolver_match else None,
+            "status": response.status_code,
+            "total_ms": round((time.perf_counter() - start) * 1000, 3),
+            "db_ms": round(recorder.duration * 1000, 3),
+            "template_ms": round(request._template_duration * 1000, 3),
+            "queries": recorder.count,
+            "duplicates": recorder.duplicates(self.duplicate_threshold),
+        }
+
+        if record["view"]:
+            view_statistics.add(record["view"], record)
+
+        if record["total_ms"] >= self.slow_request_ms or record["duplicates"]:
+            logger.warning(json.dumps(record))
+
+        response.headers['Server-Timing'] = 'total;dur=%s, db;dur=%s, tpl;dur=%s' % (
+            record["total_ms"], record["db_ms"], record["template_ms"])
+
+        return response
+
+    def process_template_response(self, request, response):
+        # Läuft als letzte Template-Middleware, danach rendert Django nicht erneut
+        start = time.perf_counter()
+        response.render()
+        request._template_duration += time.perf_counter() - start
+
+        return response
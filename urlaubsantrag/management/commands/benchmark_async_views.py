@@ -0,0 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import asyncio
+import json
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+
+from users.holiday_cache import local_cache
+from urlaubsantrag.benchmark import benchmark_database
+from urlaubsantrag.synthetic import generate_synthetic_data
+from urlaubsantrag.views import AsyncCalenderView, AsyncLandingPageView, CalenderView, LandingPageView
+
+
+class Command(BaseCommand):
+    help = "Compares the throughput of the sync and async landing page and calender under concurrent load"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=1000)
+        parser.add_argument('--years', type=int, default=3)
+        parser.add_argument('--requests', type=int, default=200, help="Requests per view and mode")
+        parser.add_argument('--concurrency', type=int, default=20)
+
+    def handle(self, *args, **options):
+        year = date.today().year
+        views = {
+            "LandingPageView": (LandingPageView, AsyncLandingPageView, '/', {}),
+            "CalenderView": (CalenderView, AsyncCalenderView, '/calender/%s/' % year, {'year': year}),
+        }
+        results = {}
+
+        with benchmark_database(), override_settings(ALLOWED_HOSTS=['testserver']):
+            users = generate_synthetic_data(employees=options['employees'], years=options['years'],
+                                            departments=10, balances=True)['users']
+            users = users[:options['requests']]
+
+            for name, (sync_view, async_view, path, kwargs) in views.items():
+                results[name] = {
+                    "sync": self.run_sync(sync_view.as_view(), path, kwargs, users, options),
+                    "async": async_to_sync(self.run_async)(async_view.as_view(), path, kwargs, users, options),
+                }
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def summarize(self, seconds, count):
+        return {"requests": count, "seconds": round(seconds, 3), "requests_per_second": round(count / seconds, 1)}
+
+    def clear_caches(self):
+        # Beide Varianten starten mit kalten Fragment- und Feiertags-Caches
+        cache.clear()
+        local_cache.clear()
+
+    def run_sync(self, view, path, kwargs, users, options):
+        factory = RequestFactory()
+        self.clear_caches()
+
+        def handle(user):
+            request = factory.get(path)
+            request.user = user
+
+            try:
+                return view(request, **kwargs).render().status_code
+            finally:
+                # Jeder Worker-Thread hat eine eigene Verbindung
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            list(executor.map(handle, [users[index % len(users)] for index in range(options['requests'])]))
+
+        return self.summarize(time.perf_counter() - start, options['requests'])
+
+    async def run_async(self, view, path, kwargs, users, options):
+        factory = AsyncRequestFactory()
+        await sync_to_async(self.clear_caches)()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def handle(user):
+            async with semaphore:
+                request = factory.get(path)
+                request.user = user
+                response = await view(request, **kwargs)
+                await sync_to_async(response.render)()
+                return response.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(*(handle(users[index % len(users)]) for index in range(options['requests'])))
+
+        return self.summarize(time.perf_counter() - start, options['requests'])
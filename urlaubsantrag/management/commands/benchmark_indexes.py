@@ -0,0 +1,102 @@
+from datetime import date
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, migrations
+from django.db.migrations.loader import MigrationLoader
+
+from users.models import StandardHoliday
+from urlaubsantrag.benchmark import benchmark_database
+from urlaubsantrag.models import Request, RequestStatus
+from urlaubsantrag.synthetic import generate_synthetic_data
+
+
+# Die gemessenen Indizes und der Unique-Index der Feiertage, der ebenfalls (province, date) abdeckt und die
+# Feiertagsabfrage vorher schon bedienen würde; alle anderen Migrationen bleiben angewendet
+measured_operations = [
+    ('users', migrations.RemoveConstraint('standardholiday', 'unique_holiday_per_province')),
+    ('users', migrations.RemoveIndex('standardholiday', 'holiday_province_date_idx')),
+    ('urlaubsantrag', migrations.RemoveIndex('request', 'request_user_status_range_idx')),
+    ('urlaubsantrag', migrations.RemoveIndex('request', 'request_status_range_idx')),
+]
+
+
+class Command(BaseCommand):
+    help = "Seeds synthetic data and records query plans and timings with and without the composite indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=1000)
+        parser.add_argument('--years', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=100)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.stdout.write("Seeding %s employees over %s years..." % (options['employees'], options['years']))
+            data = generate_synthetic_data(employees=options['employees'], years=options['years'])
+
+            user = data['users'][len(data['users']) // 2]
+            year = date.today().year
+            queries = self.get_queries(user, year)
+
+            # Vorher: Schema ohne die zusammengesetzten Indizes und den Unique-Index der Feiertage
+            self.remove_indexes()
+            before = self.run_queries(queries, options['repeat'])
+
+            self.add_indexes()
+            after = self.run_queries(queries, options['repeat'])
+
+        self.stdout.write("before: without %s" % ', '.join(operation.name for _, operation in measured_operations))
+
+        for name in queries:
+            self.stdout.write("\n== %s" % name)
+            self.stdout.write("before: %8.3f ms" % before[name]['milliseconds'])
+            self.stdout.write(before[name]['plan'])
+            self.stdout.write("after:  %8.3f ms" % after[name]['milliseconds'])
+            self.stdout.write(after[name]['plan'])
+
+    def get_queries(self, user, year):
+        start_of_year = date(year, 1, 1)
+        end_of_year = date(year, 12, 31)
+
+        return {
+            "vacation usage": Request.objects.filter(requested_by=user, request_status=RequestStatus.ACCEPTED,
+                                                     start_date__lte=end_of_year, end_date__gte=start_of_year),
+            "calender": Request.objects.filter(request_status=RequestStatus.ACCEPTED, start_date__lte=end_of_year,
+                                               end_date__gte=start_of_year),
+            "holidays": StandardHoliday.objects.filter(province=user.province_id, country=user.country,
+                                                       date__gte=start_of_year, date__lte=end_of_year),
+        }
+
+    def run_queries(self, queries, repeat):
+        results = {}
+
+        for name, queryset in queries.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+
+            results[name] = {
+                "milliseconds": (time.perf_counter() - start) * 1000 / repeat,
+                "plan": queryset.explain(),
+            }
+
+        return results
+
+    def remove_indexes(self):
+        # Über den Migrationszustand statt Model._meta: SQLite baut die Tabelle für Constraints neu auf und
+        # übernähme sonst Constraint und Indizes aus dem Modell
+        state = MigrationLoader(connection).project_state()
+        self.states = [state]
+
+        with connection.schema_editor() as schema_editor:
+            for app_label, operation in measured_operations:
+                new_state = state.clone()
+                operation.state_forwards(app_label, new_state)
+                operation.database_forwards(app_label, schema_editor, state, new_state)
+                self.states.append(new_state)
+                state = new_state
+
+    def add_indexes(self):
+        with connection.schema_editor() as schema_editor:
+            for index, (app_label, operation) in reversed(list(enumerate(measured_operations))):
+                operation.database_backwards(app_label, schema_editor, self.states[index + 1], self.states[index])
@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+import random
+
+import holidays
+from django.core.management.base import BaseCommand
+
+from users.models import CustomUser, Province, StandardHoliday
+from urlaubsantrag.benchmark import benchmark_database, measure
+from urlaubsantrag.models import Request, RequestStatus
+from urlaubsantrag.views import calculate_vacation_usage
+
+
+def legacy_vacation_usage(user, year):
+    # Alte Implementierung mit einer Feiertagsabfrage pro Tag, nur zum Vergleich
+    start_of_year = date(year, 1, 1)
+    end_of_year = date(year, 12, 31)
+
+    user_request_current_year = Request.objects.filter(requested_by=user, request_status=RequestStatus.ACCEPTED,
+                                                       start_date__lte=end_of_year, end_date__gte=start_of_year)
+
+    vacation_taken = 0
+
+    for request in user_request_current_year:
+        current_date = max(request.start_date, start_of_year)
+        end_date = min(request.end_date, end_of_year)
+
+        while current_date <= end_date:
+            if not StandardHoliday.objects.filter(date=current_date, province=user.province, country=user.country).exists():
+                if current_date.weekday() in [0, 1, 2, 3, 4]:
+                    vacation_taken += 1
+
+            current_date += timedelta(days=1)
+
+    return vacation_taken
+
+
+class Command(BaseCommand):
+    help = "Compares the per-day holiday query loop with the set based workday counting"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--year', type=int, default=date.today().year)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            users = self.generate_data(options['requests'], options['users'], options['year'])
+
+            with measure() as legacy:
+                legacy_usage = [legacy_vacation_usage(user, options['year']) for user in users]
+
+            with measure() as current:
+                current_usage = [calculate_vacation_usage(user, options['year']) for user in users]
+
+        if legacy_usage != current_usage:
+            self.stderr.write("Results differ between legacy and current implementation!")
+
+        for name, result in (("legacy", legacy), ("current", current)):
+            self.stdout.write("%-8s %8.3fs %8d queries" % (name, result["seconds"], result["queries"]))
+
+    def generate_data(self, request_count, user_count, year):
+        province = Province.objects.create(name='Bayern', state_abreviation='BY', country='DE')
+
+        StandardHoliday.objects.bulk_create(
+            StandardHoliday(name=name, country='DE', province=province, date=holiday_date)
+            for holiday_date, name in holidays.Germany(years=year, prov='BY', language='de').items()
+        )
+
+        users = CustomUser.objects.bulk_create(
+            CustomUser(email='benchmark%s@example.com' % number, first_name='Benchmark', last_name=str(number),
+                       abbreviation='B%s' % (number % 100), staff_nr=str(number), province=province, country='DE')
+            for number in range(user_count)
+        )
+
+        randomizer = random.Random(year)
+        requests = []
+
+        for number in range(request_count):
+            start_date = date(year, 1, 1) + timedelta(days=randomizer.randrange(365))
+            requests.append(Request(requested_by=users[number % user_count], start_date=start_date,
+                                    end_date=start_date + timedelta(days=randomizer.randrange(5)),
+                                    request_status=RequestStatus.ACCEPTED))
+
+        Request.objects.bulk_create(requests, batch_size=1000)
+
+        return users
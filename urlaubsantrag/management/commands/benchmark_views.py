@@ -0,0 +1,122 @@
+from datetime import date
+import json
+import statistics
+import subprocess
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from users.models import CustomUser
+from urlaubsantrag.benchmark import benchmark_database, measure
+from urlaubsantrag.models import Request, RequestStatus
+from urlaubsantrag.synthetic import generate_synthetic_data
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(path, runs):
+    milliseconds = [run["seconds"] * 1000 for run in runs]
+
+    return {
+        "path": path,
+        "runs": len(runs),
+        "median_ms": round(statistics.median(milliseconds), 3),
+        "min_ms": round(min(milliseconds), 3),
+        "max_ms": round(max(milliseconds), 3),
+        "queries": max(run["queries"] for run in runs),
+        "status_codes": sorted({run["status_code"] for run in runs}),
+    }
+
+
+class Command(BaseCommand):
+    help = "Seeds a throwaway database and measures time and query counts of the main views as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=2000)
+        parser.add_argument('--departments', type=int, default=20)
+        parser.add_argument('--years', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', help="Write the results to this file instead of stdout")
+        parser.add_argument('--compare', help="Results of an earlier run to compare against")
+
+    def handle(self, *args, **options):
+        with benchmark_database(), override_settings(ALLOWED_HOSTS=['testserver']):
+            data = generate_synthetic_data(employees=options['employees'], years=options['years'],
+                                           departments=options['departments'], balances=True)
+            admin = CustomUser.objects.create(email='benchmark-admin@example.com', first_name='Benchmark',
+                                              last_name='Admin', abbreviation='BA', staff_nr='0',
+                                              province=data['provinces'][0], country='DE',
+                                              department=data['departments'][0] if data['departments'] else None,
+                                              is_staff=True, is_superuser=True)
+            employee = data['users'][len(data['users']) // 2]
+
+            results = {
+                "revision": git_revision(),
+                "employees": options['employees'],
+                "years": options['years'],
+                "requests": len(data['requests']),
+                "views": self.run_views(admin, employee, options['repeat']),
+            }
+
+        output = json.dumps(results, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def run_views(self, admin, employee, repeat):
+        year = date.today().year
+        paths = {
+            "LandingPageView": (employee, '/'),
+            "CalenderView": (employee, '/calender/%s/' % year),
+            "RequestAdministrationView": (admin, '/request_administration/'),
+            "UserOverviewView": (admin, '/user_overview/'),
+        }
+        results = {}
+
+        for name, (user, path) in paths.items():
+            client = Client()
+            client.force_login(user)
+            # Der erste Aufruf wärmt Caches und Templates auf und wird nicht gemessen
+            client.get(path)
+            results[name] = summarize(path, [self.request(client, 'get', path) for _ in range(repeat)])
+
+        client = Client()
+        client.force_login(admin)
+        new_requests = list(Request.objects.filter(request_status=RequestStatus.NEW).order_by('-pk')
+                            .values_list('pk', flat=True)[:repeat])
+        results["ApproveRequest"] = summarize('/request_details/<pk>/', [
+            self.request(client, 'post', '/request_details/%s/' % pk, {'approve': 'true'}) for pk in new_requests])
+
+        return results
+
+    def request(self, client, method, path, data=None):
+        with measure() as result:
+            response = getattr(client, method)(path, data)
+
+        result["status_code"] = response.status_code
+        return result
+
+    def compare(self, path, results):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        self.stderr.write("\n%-28s %12s %12s %10s" % ("view", "median ms", "baseline", "queries"))
+        for name, current in results["views"].items():
+            previous = baseline["views"].get(name)
+            if previous is None:
+                continue
+
+            self.stderr.write("%-28s %12.1f %12.1f %4s -> %s" % (
+                name, current["median_ms"], previous["median_ms"], previous["queries"], current["queries"]))
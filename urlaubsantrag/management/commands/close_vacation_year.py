@@ -0,0 +1,59 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+import time
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from users.models import Department
+from urlaubsantrag.carryover import (calculate_carryovers, calculate_department_carryovers, closing_users,
+                                     write_carryovers)
+
+
+def init_worker():
+    # Mit "spawn" (macOS, Windows) kennt der Worker-Prozess die Einstellungen noch nicht
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = "Closes a vacation year and carries every user's remaining days over into the next year"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, default=date.today().year - 1)
+        parser.add_argument('--max-days', type=int, default=None, help="Carry over at most this many days")
+        parser.add_argument('--resume', action='store_true', help="Skip users that already have a carryover")
+        parser.add_argument('--workers', type=int, default=1, help="Processes, each calculates whole departments")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        year = options['year']
+
+        if options['workers'] > 1:
+            carryovers = self.calculate_parallel(year, options)
+        else:
+            carryovers = calculate_carryovers(closing_users(year, resume=options['resume']), year, options['max_days'])
+
+        write_carryovers(carryovers, year, options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS("Carried %s days of %s users from %s into %s in %.1fs" % (
+            sum(carryover.days for carryover in carryovers), len(carryovers), year, year + 1,
+            time.perf_counter() - start)))
+
+    def calculate_parallel(self, year, options):
+        department_ids = list(Department.objects.values_list('pk', flat=True))
+        carryovers = calculate_carryovers(closing_users(year, resume=options['resume']).filter(department=None), year,
+                                          options['max_days'])
+
+        # Geforkte Prozesse dürfen die Verbindungen des Hauptprozesses nicht weiterverwenden
+        connections.close_all()
+
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as executor:
+            futures = [executor.submit(calculate_department_carryovers, year, department_id, options['max_days'],
+                                       options['resume']) for department_id in department_ids]
+
+            for future in futures:
+                carryovers.extend(future.result())
+
+        return carryovers
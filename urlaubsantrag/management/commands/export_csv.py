@@ -0,0 +1,32 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from urlaubsantrag.export import export_balances, export_requests
+from urlaubsantrag.models import Request
+
+
+class Command(BaseCommand):
+    help = "Streams the request history or the yearly vacation balances as CSV for payroll"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['requests', 'balances'])
+        parser.add_argument('--year', type=int, help="Only requests overlapping this year, balances default to this year")
+        parser.add_argument('--output', help="Write to this file instead of stdout")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['kind'] == 'requests':
+            requests = None
+            if options['year']:
+                requests = Request.objects.in_range(date(options['year'], 1, 1), date(options['year'], 12, 31))
+            rows = export_requests(requests, chunk_size=options['chunk_size'])
+        else:
+            rows = export_balances(options['year'] or date.today().year, chunk_size=options['chunk_size'])
+
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(rows)
+        else:
+            for row in rows:
+                self.stdout.write(row, ending='')
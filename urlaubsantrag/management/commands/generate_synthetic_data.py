@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from urlaubsantrag.synthetic import generate_synthetic_data
+
+
+class Command(BaseCommand):
+    help = "Generates departments, employees and years of vacation requests for load tests"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=2000)
+        parser.add_argument('--departments', type=int, default=20)
+        parser.add_argument('--years', type=int, default=5)
+        parser.add_argument('--requests-per-year', type=int, default=5)
+        parser.add_argument('--first-year', type=int)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        data = generate_synthetic_data(employees=options['employees'], years=options['years'],
+                                       requests_per_year=options['requests_per_year'],
+                                       first_year=options['first_year'], seed=options['seed'],
+                                       departments=options['departments'], balances=True)
+
+        self.stdout.write(self.style.SUCCESS("Generated %s departments, %s employees and %s requests in %.1fs" % (
+            len(data['departments']), len(data['users']), len(data['requests']), time.perf_counter() - start)))
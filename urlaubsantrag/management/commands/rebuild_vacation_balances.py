@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min
+
+from users.models import CustomUser
+from urlaubsantrag.models import Request, VacationBalance
+from urlaubsantrag.vacation import calculate_balances, update_vacation_balances
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the materialized vacation balances from the requests or verifies them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, action='append', dest='years')
+        parser.add_argument('--verify', action='store_true', help="Only compare the stored balances, do not write")
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        years = options['years'] or self.get_years()
+        users = list(CustomUser.objects.only('province_id', 'country').order_by('pk'))
+        chunks = [users[index:index + options['chunk_size']] for index in range(0, len(users), options['chunk_size'])]
+
+        if options['verify']:
+            self.verify(years, chunks)
+            return
+
+        with transaction.atomic():
+            VacationBalance.objects.filter(year__in=years).delete()
+
+            for year in years:
+                for chunk in chunks:
+                    update_vacation_balances(chunk, year)
+
+        self.stdout.write("Rebuilt %s balances for %s year(s)" % (len(users) * len(years), len(years)))
+
+    def get_years(self):
+        request_range = Request.objects.aggregate(first=Min('start_date'), last=Max('end_date'))
+        years = set(VacationBalance.objects.values_list('year', flat=True).distinct())
+
+        if request_range['first'] is not None:
+            years.update(range(request_range['first'].year, request_range['last'].year + 1))
+
+        return sorted(years)
+
+    def verify(self, years, chunks):
+        mismatches = missing = 0
+
+        for year in years:
+            for chunk in chunks:
+                stored = {balance.user_id: balance
+                          for balance in VacationBalance.objects.filter(year=year, user__in=chunk)}
+
+                for user_id, values in calculate_balances(chunk, year, fresh=True).items():
+                    balance = stored.get(user_id)
+
+                    if balance is None:
+                        # Fehlende Bilanzen werden beim ersten Zugriff berechnet, sind aber nicht geprüft
+                        missing += 1
+                        self.stdout.write("User %s, %s: no stored balance, expected %s/%s" % (
+                            user_id, year, values['days_taken'], values['days_pending']))
+                        continue
+
+                    if (balance.days_taken, balance.days_pending) != (values['days_taken'], values['days_pending']):
+                        mismatches += 1
+                        self.stdout.write("User %s, %s: stored %s/%s, expected %s/%s" % (
+                            user_id, year, balance.days_taken, balance.days_pending, values['days_taken'],
+                            values['days_pending']))
+
+        if missing:
+            self.stdout.write("%s vacation balance(s) are not stored yet" % missing)
+
+        if mismatches:
+            raise CommandError("%s vacation balance(s) are out of date" % mismatches)
+
+        self.stdout.write("All stored vacation balances are consistent")
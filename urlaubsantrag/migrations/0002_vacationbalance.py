@@ -0,0 +1,30 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('urlaubsantrag', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VacationBalance',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('year', models.PositiveSmallIntegerField()),
+                ('days_taken', models.IntegerField(default=0)),
+                ('days_pending', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vacation_balances', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='vacationbalance',
+            constraint=models.UniqueConstraint(fields=('user', 'year'), name='unique_vacation_balance_per_year'),
+        ),
+    ]
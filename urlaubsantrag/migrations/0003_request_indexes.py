@@ -0,0 +1,21 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urlaubsantrag', '0002_vacationbalance'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['requested_by', 'request_status', 'start_date', 'end_date'], name='request_user_status_range_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['request_status', 'start_date', 'end_date'], name='request_status_range_idx'),
+        ),
+    ]
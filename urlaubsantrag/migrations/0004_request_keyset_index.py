@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urlaubsantrag', '0003_request_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['-start_date', '-id'], name='request_start_date_id_idx'),
+        ),
+    ]
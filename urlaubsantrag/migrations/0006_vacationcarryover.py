@@ -0,0 +1,30 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('urlaubsantrag', '0005_request_modified_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VacationCarryover',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('year', models.PositiveSmallIntegerField()),
+                ('days', models.IntegerField(default=0)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vacation_carryovers', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='vacationcarryover',
+            constraint=models.UniqueConstraint(fields=('user', 'year'), name='unique_vacation_carryover_per_year'),
+        ),
+    ]
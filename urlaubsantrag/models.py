@@ -11,6 +11,28 @@ class RequestStatus(models.TextChoices):
     DENIED = 'DEN', _('Abgelehnt')
 
 
+class RequestQuerySet(models.QuerySet):
+    def in_range(self, first_day, last_day):
+        return self.filter(start_date__lte=last_day, end_date__gte=first_day)
+
+    def accepted(self):
+        return self.filter(request_status=RequestStatus.ACCEPTED)
+
+    def with_users(self):
+        return self.select_related('requested_by__department', 'acknowledged_by')
+
+    def for_administration(self):
+        return self.with_users().order_by('-start_date', '-id')
+
+    def for_calender(self, first_day, last_day):
+        return self.accepted().in_range(first_day, last_day).select_related('requested_by').only(
+            'start_date', 'end_date', 'request_status', 'requested_by__abbreviation', 'requested_by__first_name',
+            'requested_by__last_name').order_by('start_date', 'id')
+
+    def history_for(self, user):
+        return self.filter(requested_by=user).only('start_date', 'end_date', 'request_status').order_by('-start_date')
+
+
 class Request(models.Model):
     id = models.BigAutoField(primary_key=True)
 
@@ -24,6 +46,17 @@ class Request(models.Model):
 
     request_status = models.CharField(max_length=3, choices=RequestStatus.choices, default=RequestStatus.NEW)
 
+    modified_at = models.DateTimeField(auto_now=True)
+
+    objects = RequestQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['requested_by', 'request_status', 'start_date', 'end_date'], name='request_user_status_range_idx'),
+            models.Index(fields=['request_status', 'start_date', 'end_date'], name='request_status_range_idx'),
+            models.Index(fields=['-start_date', '-id'], name='request_start_date_id_idx'),
+        ]
+
     # Eine Funktion der Klasse models.Model wird überschrieben --> self Zugriff auf das aktuelle Objekt
     # Beispiel: Wir wollen das Startdatum nicht einfach als String anzeigen, sondern holen uns das Datum vom Objekt selbst
     def __str__(self):
@@ -31,3 +64,41 @@ class Request(models.Model):
 
     def get_absolute_url(self):
         return "/"
+
+
+class VacationBalance(models.Model):
+    id = models.BigAutoField(primary_key=True)
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="vacation_balances")
+    year = models.PositiveSmallIntegerField()
+
+    days_taken = models.IntegerField(default=0)
+    days_pending = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'year'], name='unique_vacation_balance_per_year'),
+        ]
+
+    def __str__(self):
+        return '%s | %s | %s | %s' % (self.user, self.year, self.days_taken, self.days_pending)
+
+
+class VacationCarryover(models.Model):
+    id = models.BigAutoField(primary_key=True)
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="vacation_carryovers")
+    # Jahr, in dem die übertragenen Tage genommen werden können
+    year = models.PositiveSmallIntegerField()
+
+    days = models.IntegerField(default=0)
+
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'year'], name='unique_vacation_carryover_per_year'),
+        ]
+
+    def __str__(self):
+        return '%s | %s | %s' % (self.user, self.year, self.days)
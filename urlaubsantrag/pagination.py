@@ -0,0 +1,58 @@
+from datetime import date
+
+from django.db.models import Q
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(request):
+    return '%s_%s' % (request.start_date.isoformat(), request.pk)
+
+
+def decode_cursor(value):
+    try:
+        start_date, pk = value.split('_', 1)
+        return date.fromisoformat(start_date), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+# Seek-Pagination auf (start_date, id) absteigend, jede Seite kostet gleich viel wie die erste
+def keyset_page(queryset, after=None, before=None, page_size=30):
+    after = decode_cursor(after) if after else None
+    before = decode_cursor(before) if before else None
+
+    if before:
+        start_date, pk = before
+        items = list(queryset.filter(Q(start_date__gt=start_date) | Q(start_date=start_date, pk__gt=pk))
+                     .order_by('start_date', 'pk')[:page_size + 1])
+
+        has_previous = len(items) > page_size
+        items = items[:page_size]
+        items.reverse()
+
+        return KeysetPage(items, next_cursor=encode_cursor(items[-1]) if items else None,
+                          previous_cursor=encode_cursor(items[0]) if has_previous else None)
+
+    if after:
+        start_date, pk = after
+        queryset = queryset.filter(Q(start_date__lt=start_date) | Q(start_date=start_date, pk__lt=pk))
+
+    items = list(queryset.order_by('-start_date', '-pk')[:page_size + 1])
+
+    has_next = len(items) > page_size
+    items = items[:page_size]
+
+    return KeysetPage(items, next_cursor=encode_cursor(items[-1]) if has_next else None,
+                      previous_cursor=encode_cursor(items[0]) if after and items else None)
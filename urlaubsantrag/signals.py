@@ -0,0 +1,141 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from users.models import CustomUser, StandardHoliday, holidays_changed, users_imported
+from .calender_cache import bump_holiday, bump_holiday_years, bump_request, bump_user_requests
+from .models import Request, RequestStatus
+from .vacation import add_request_days, apply_balance_changes, balance_changes, balance_fields, \
+    recalculate_vacation_balances
+
+
+def recalculate_province_balances(province_id, year):
+    users = CustomUser.objects.filter(province_id=province_id, vacation_balances__year=year)
+    recalculate_vacation_balances(users.only('province_id', 'country'), years=[year])
+
+
+@receiver(post_save, sender=StandardHoliday)
+@receiver(post_delete, sender=StandardHoliday)
+def update_balances_for_holiday(sender, instance, **kwargs):
+    affected = {(instance.province_id, instance.date.year)}
+
+    # _previous_holiday setzt users.models.remember_previous_holiday
+    previous_holiday = getattr(instance, '_previous_holiday', None)
+    if previous_holiday is not None:
+        affected.add((previous_holiday[0], previous_holiday[1].year))
+
+    for province_id, year in affected:
+        recalculate_province_balances(province_id, year)
+
+    bump_holiday(instance.province_id, instance.date)
+    if previous_holiday is not None:
+        bump_holiday(*previous_holiday)
+
+
+@receiver(holidays_changed)
+def update_balances_for_generated_holidays(sender, province, years, **kwargs):
+    users = CustomUser.objects.filter(province=province).only('province_id', 'country')
+    recalculate_vacation_balances(users, years=years)
+    bump_holiday_years(province.pk, years)
+
+
+# Felder, die in den gerenderten Kalendermonaten bzw. deren Abteilungsfilter vorkommen
+calender_user_fields = ['abbreviation', 'first_name', 'last_name', 'department']
+
+
+@receiver(pre_save, sender=CustomUser)
+def remember_previous_user(sender, instance, update_fields=None, **kwargs):
+    instance._province_changed = False
+    instance._calender_changed = False
+
+    if instance.pk is None:
+        return
+
+    if update_fields is not None and not {'province', 'country', *calender_user_fields} & set(update_fields):
+        return
+
+    previous = CustomUser.objects.filter(pk=instance.pk).values_list(
+        'province_id', 'country', 'abbreviation', 'first_name', 'last_name', 'department_id').first()
+
+    if previous is not None:
+        instance._province_changed = (previous[0], previous[1] or '') != (instance.province_id, str(instance.country or ''))
+        instance._calender_changed = previous[2:] != (instance.abbreviation, instance.first_name, instance.last_name,
+                                                      instance.department_id)
+
+
+@receiver(post_save, sender=CustomUser)
+def update_balances_for_province(sender, instance, **kwargs):
+    if getattr(instance, '_province_changed', False):
+        recalculate_vacation_balances([instance])
+
+
+@receiver(post_save, sender=CustomUser)
+def update_calender_for_user(sender, instance, **kwargs):
+    if getattr(instance, '_calender_changed', False):
+        bump_user_requests(instance)
+
+
+@receiver(users_imported)
+def update_balances_for_imported_users(sender, users, **kwargs):
+    if users:
+        recalculate_vacation_balances(users)
+
+
+@receiver(users_imported)
+def update_calender_for_imported_users(sender, calender_users=(), **kwargs):
+    for user in calender_users:
+        bump_user_requests(user)
+
+
+@receiver(pre_save, sender=Request)
+def remember_previous_request(sender, instance, **kwargs):
+    instance._previous_request = None
+
+    if instance.pk is not None:
+        instance._previous_request = Request.objects.filter(pk=instance.pk).values_list(
+            'start_date', 'end_date', 'request_status', 'requested_by_id').first()
+
+
+@receiver(post_save, sender=Request)
+def update_balances_for_request(sender, instance, **kwargs):
+    # Jede Änderung über das ORM (Ansichten, Admin, Skripte) hält die Bilanzen aktuell; die
+    # Sammelbearbeitung nutzt update() und verbucht selbst
+    previous_request = getattr(instance, '_previous_request', None)
+    current = (instance.start_date, instance.end_date, instance.request_status, instance.requested_by_id)
+
+    if previous_request == current:
+        return
+
+    changes = balance_changes()
+    users = {instance.requested_by_id: instance.requested_by}
+
+    if previous_request is not None:
+        start_date, end_date, request_status, user_id = previous_request
+        if user_id not in users:
+            users[user_id] = CustomUser.objects.only('province_id', 'country').get(pk=user_id)
+        add_request_days(changes, users[user_id], start_date, end_date, request_status, -1)
+
+    add_request_days(changes, instance.requested_by, instance.start_date, instance.end_date, instance.request_status)
+    apply_balance_changes(changes, users)
+
+
+@receiver(post_delete, sender=Request)
+def update_balances_for_deleted_request(sender, instance, **kwargs):
+    if instance.request_status not in balance_fields:
+        return
+
+    changes = balance_changes()
+    add_request_days(changes, instance.requested_by, instance.start_date, instance.end_date, instance.request_status, -1)
+
+    # Ohne gespeicherte Bilanz gibt es nichts abzuziehen, z. B. wenn der Benutzer mitsamt Bilanzen gelöscht wird
+    apply_balance_changes(changes, {}, create_missing=False)
+
+
+@receiver(post_save, sender=Request)
+@receiver(post_delete, sender=Request)
+def update_calender_for_request(sender, instance, **kwargs):
+    previous_request = getattr(instance, '_previous_request', None)
+    was_accepted = previous_request is not None and previous_request[2] == RequestStatus.ACCEPTED
+
+    # Der Kalender zeigt nur genehmigte Anträge, nur deren Monate werden neu gerendert
+    if was_accepted or instance.request_status == RequestStatus.ACCEPTED:
+        bump_request(instance, previous_request[:2] if was_accepted else None)
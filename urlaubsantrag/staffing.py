@@ -0,0 +1,117 @@
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Count
+
+from users.models import CustomUser
+from .models import Request, RequestStatus
+
+
+class StaffingShortage:
+    def __init__(self, day, available, required):
+        self.day = day
+        self.available = available
+        self.required = required
+
+
+def merge_intervals(intervals):
+    # Überlappende Anträge derselben Person zählen pro Tag nur einmal
+    merged = []
+
+    for start_date, end_date in sorted(intervals):
+        if merged and start_date <= merged[-1][1] + timedelta(days=1):
+            merged[-1][1] = max(merged[-1][1], end_date)
+        else:
+            merged.append([start_date, end_date])
+
+    return merged
+
+
+class AbsenceProfile:
+    # Sweep über Start- und Endereignisse: Anzahl Abwesender als Stufenfunktion über die Tage
+    def __init__(self, intervals_by_user):
+        self.intervals_by_user = {user_id: merge_intervals(intervals) for user_id, intervals in intervals_by_user.items()}
+
+        changes = defaultdict(int)
+        for intervals in self.intervals_by_user.values():
+            for start_date, end_date in intervals:
+                changes[start_date] += 1
+                changes[end_date + timedelta(days=1)] -= 1
+
+        self.days = sorted(changes)
+        self.counts = []
+
+        absent = 0
+        for day in self.days:
+            absent += changes[day]
+            self.counts.append(absent)
+
+    def absent_on(self, day):
+        index = bisect_right(self.days, day) - 1
+        return self.counts[index] if index >= 0 else 0
+
+    def is_absent(self, user_id, day):
+        return any(start_date <= day <= end_date for start_date, end_date in self.intervals_by_user.get(user_id, ()))
+
+
+def get_headcounts(department_ids):
+    users = CustomUser.objects.filter(department__in=department_ids, is_active=True)
+    return dict(users.values_list('department').annotate(count=Count('id')).order_by())
+
+
+def get_absence_profiles(department_ids, first_day, last_day):
+    intervals = defaultdict(lambda: defaultdict(list))
+    requests = Request.objects.accepted().in_range(first_day, last_day).filter(
+        requested_by__department__in=department_ids, requested_by__is_active=True)
+
+    for department_id, user_id, start_date, end_date in requests.values_list(
+            'requested_by__department', 'requested_by', 'start_date', 'end_date').order_by():
+        intervals[department_id][user_id].append((start_date, end_date))
+
+    return {department_id: AbsenceProfile(intervals[department_id]) for department_id in department_ids}
+
+
+def find_shortages(request, department, headcount, profile):
+    shortages = []
+    day = request.start_date
+
+    while day <= request.end_date:
+        if day.weekday() < 5:
+            absent = profile.absent_on(day)
+
+            if not profile.is_absent(request.requested_by_id, day):
+                absent += 1
+
+            if headcount - absent < department.required_employees:
+                shortages.append(StaffingShortage(day, headcount - absent, department.required_employees))
+
+        day += timedelta(days=1)
+
+    return shortages
+
+
+def evaluate_requests(requests):
+    # Eine Abfrage für die Kopfzahlen und eine für alle genehmigten Abwesenheiten der betroffenen Abteilungen
+    requests = [request for request in requests if request.request_status == RequestStatus.NEW]
+    departments = {request.requested_by.department_id: request.requested_by.department for request in requests
+                   if request.requested_by.department_id is not None}
+    departments = {department_id: department for department_id, department in departments.items()
+                   if department.required_employees}
+
+    requests = [request for request in requests if request.requested_by.department_id in departments]
+    if not requests:
+        return {}
+
+    headcounts = get_headcounts(list(departments))
+    profiles = get_absence_profiles(list(departments), min(request.start_date for request in requests),
+                                    max(request.end_date for request in requests))
+
+    return {request.pk: find_shortages(request, departments[request.requested_by.department_id],
+                                       headcounts.get(request.requested_by.department_id, 0),
+                                       profiles[request.requested_by.department_id])
+            for request in requests}
+
+
+def evaluate_request(request):
+    return evaluate_requests([request]).get(request.pk, [])
@@ -0,0 +1,107 @@
+from datetime import date, timedelta
+import random
+
+import holidays
+from django.db import transaction
+
+from users.models import CustomUser, Department, Province, StandardHoliday
+from .models import Request, RequestStatus
+from .vacation import update_vacation_balances
+
+
+german_states = {
+    'BW': 'Baden-Württemberg',
+    'BY': 'Bayern',
+    'BE': 'Berlin',
+    'HE': 'Hessen',
+    'NW': 'Nordrhein-Westfalen',
+    'SN': 'Sachsen',
+}
+
+department_names = ['Buchhaltung', 'Einkauf', 'Entwicklung', 'Personal', 'Produktion', 'Qualität', 'Service',
+                    'Vertrieb', 'Logistik', 'Marketing']
+
+# Gewichtung der Status, grob wie im echten Betrieb: die meisten Anträge sind genehmigt
+status_weights = {RequestStatus.ACCEPTED: 7, RequestStatus.NEW: 2, RequestStatus.DENIED: 1}
+
+
+def generate_provinces(years):
+    provinces = []
+
+    for state, name in german_states.items():
+        province = Province.objects.filter(state_abreviation=state, country='DE').order_by('pk').first()
+        if province is None:
+            province = Province.objects.create(name=name, state_abreviation=state, country='DE')
+        provinces.append(province)
+
+        StandardHoliday.objects.bulk_create((
+            StandardHoliday(name=holiday_name, country='DE', province=province, date=holiday_date)
+            for holiday_date, holiday_name in holidays.Germany(years=years, prov=state, language='de').items()
+        ), ignore_conflicts=True)
+
+    return provinces
+
+
+def generate_departments(count, randomizer):
+    departments = [Department(name='%s %s' % (department_names[number % len(department_names)], number + 1),
+                              required_employees=randomizer.randint(1, 5))
+                   for number in range(count)]
+    Department.objects.bulk_create(departments)
+
+    return list(Department.objects.filter(name__in=[department.name for department in departments]).order_by('-pk')[:count])
+
+
+def generate_users(count, provinces, randomizer, departments=None):
+    # Mehrfache Läufe erzeugen neue Mitarbeiter statt an der eindeutigen E-Mail zu scheitern
+    existing = CustomUser.objects.filter(email__startswith='employee')
+    first_number = existing.count()
+    last_pk = CustomUser.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+    CustomUser.objects.bulk_create((
+        CustomUser(email='employee%s@example.com' % number, first_name='Employee', last_name=str(number),
+                   abbreviation='E%s' % (number % 100), staff_nr=str(number)[:6], country='DE',
+                   province=randomizer.choice(provinces),
+                   department=randomizer.choice(departments) if departments else None,
+                   is_staff=number % 50 == 0, vacation_entitlement=randomizer.choice([24, 26, 28, 30]))
+        for number in range(first_number, first_number + count)
+    ), batch_size=1000)
+
+    # Nicht jedes Backend liefert bei bulk_create die Primärschlüssel zurück
+    return list(existing.filter(pk__gt=last_pk).order_by('pk'))
+
+
+def generate_requests(users, years, requests_per_year, randomizer):
+    requests = []
+
+    for user in users:
+        for year in years:
+            for _ in range(requests_per_year):
+                start_date = date(year, 1, 1) + timedelta(days=randomizer.randrange(365))
+                requests.append(Request(
+                    requested_by=user, start_date=start_date,
+                    end_date=start_date + timedelta(days=randomizer.randrange(10)),
+                    request_status=randomizer.choices(list(status_weights), list(status_weights.values()))[0],
+                ))
+
+    Request.objects.bulk_create(requests, batch_size=1000)
+
+    return requests
+
+
+def generate_synthetic_data(employees=1000, years=10, requests_per_year=5, first_year=None, seed=0, departments=0,
+                            balances=False):
+    first_year = first_year or date.today().year - years + 1
+    years = range(first_year, first_year + years)
+    randomizer = random.Random(seed)
+
+    with transaction.atomic():
+        provinces = generate_provinces(years)
+        departments = generate_departments(departments, randomizer) if departments else []
+        users = generate_users(employees, provinces, randomizer, departments)
+        requests = generate_requests(users, years, requests_per_year, randomizer)
+
+        if balances:
+            for year in years:
+                update_vacation_balances(users, year)
+
+    return {"provinces": provinces, "departments": departments, "users": users, "requests": requests}
@@ -0,0 +1,23 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    # Pfad -> maximale Anzahl an Abfragen, geprüft von assertQueryBudgets()
+    query_budgets = {}
+
+    def assertQueryBudget(self, path, budget, method='get', data=None, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(path, data, **kwargs)
+
+        if len(queries) > budget:
+            self.fail("%s %s ran %s queries, the budget is %s:\n%s" % (
+                method.upper(), path, len(queries), budget, "\n".join(query['sql'] for query in queries)))
+
+        return response
+
+    def assertQueryBudgets(self):
+        for path, budget in self.query_budgets.items():
+            with self.subTest(path=path):
+                response = self.assertQueryBudget(path, budget)
+                self.assertEqual(response.status_code, 200)
@@ -1,3 +1,896 @@
-from django.test import TestCase
+from datetime import date
+import asyncio
+import json
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.core.management import call_command, CommandError
+from django.db import connection
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from users.holiday_cache import HolidayYear, local_cache
+from users.models import CustomUser, Department, Province, StandardHoliday
+from .calender import build_calender, build_calender_year
+from .calender_cache import render_calender_months
+from .export import export_balances
+from .ics import feed_token, fold_line
+from .instrumentation import InstrumentationMiddleware, QueryRecorder, view_statistics
+from .forms import CreateRequestForm
+from .carryover import calculate_carryovers, closing_users
+from .models import Request, RequestStatus, VacationBalance, VacationCarryover
+from .views import AsyncCalenderView, AsyncLandingPageView, CalenderView, calculate_vacation_usage
+from .pagination import keyset_page
+from .staffing import AbsenceProfile, evaluate_requests
+from .testing import QueryBudgetMixin
+from .vacation import calculate_vacation_summary, get_vacation_summary, load_vacation_summary
+from .workdays import count_weekdays, count_workdays, workday_holidays
+
+
+def create_user(number, **extra_fields):
+    return CustomUser.objects.create_user(email='user%s@example.com' % number, first_name='Max',
+                                          last_name='Muster%s' % number, abbreviation='M%s' % number, **extra_fields)
+
+
+class CalenderTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.province = Province.objects.create(name='Bayern', state_abreviation='BY', country='DE')
+        cls.user = create_user(0, province=cls.province, country='DE')
+
+        StandardHoliday.objects.create(name='Neujahr', country='DE', province=cls.province, date=date(2024, 1, 1))
+        StandardHoliday.objects.create(name='Tag der Deutschen Einheit', country='DE', province=cls.province,
+                                       date=date(2024, 10, 3))
+
+    def setUp(self):
+        local_cache.clear()
+        cache.clear()
+
+    def create_requests(self, count):
+        first_number = CustomUser.objects.count()
+
+        for number in range(first_number, first_number + count):
+            requested_by = create_user(number, province=self.province, country='DE')
+            Request.objects.create(requested_by=requested_by, start_date=date(2024, number % 12 + 1, 1),
+                                   end_date=date(2024, number % 12 + 1, 10), request_status=RequestStatus.ACCEPTED)
+
+    def count_calender_queries(self):
+        local_cache.clear()
+        cache.clear()
+        self.client.force_login(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/calender/2024/')
+
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_year_grid(self):
+        Request.objects.create(requested_by=self.user, start_date=date(2023, 12, 28), end_date=date(2024, 1, 2),
+                               request_status=RequestStatus.ACCEPTED)
+        Request.objects.create(requested_by=self.user, start_date=date(2024, 1, 2), end_date=date(2024, 1, 3))
+
+        with self.assertNumQueries(2):
+            year_dict = build_calender_year(2024, province=self.province.id, country='DE')
+
+        january = year_dict["months"][0]
+        self.assertEqual(january["month_name"], "Januar")
+        self.assertEqual(len(year_dict["months"]), 12)
+
+        first_week = january["weeks"][0]
+        self.assertEqual(first_week[0]["day_date"], "2024-01-01")
+        self.assertEqual(len(first_week[0]["holiday"]), 1)
+        self.assertEqual(len(first_week[1]["entries"]), 1)
+        self.assertEqual(first_week[2]["entries"], [])
+
+        # Der 1. Februar 2024 ist ein Donnerstag
+        self.assertEqual(year_dict["months"][1]["weeks"][0][:3], [None, None, None])
+
+    def test_month_window_and_department(self):
+        department = Department.objects.create(name='IT')
+        colleague = create_user(1, department=department)
+        Request.objects.create(requested_by=colleague, start_date=date(2024, 4, 1), end_date=date(2024, 4, 30),
+                               request_status=RequestStatus.ACCEPTED)
+        Request.objects.create(requested_by=self.user, start_date=date(2024, 4, 1), end_date=date(2024, 4, 30),
+                               request_status=RequestStatus.ACCEPTED)
+
+        calender = build_calender(2024, range(4, 7), province=self.province.id, country='DE', department=department)
+
+        self.assertEqual([month["month_number"] for month in calender["months"]], [4, 5, 6])
+        self.assertEqual(calender["months"][0]["weeks"][0][0]["entries"], [Request.objects.get(requested_by=colleague)])
+
+        self.client.force_login(self.user)
+        response = self.client.get('/calender/', {'period': '5', 'department': department.pk})
+        self.assertEqual([month["month_name"] for month in response.context["selected_year_dict"]["months"]], ["Mai"])
+
+    def test_calender_data_etag(self):
+        user_request = Request.objects.create(requested_by=self.user, start_date=date(2024, 1, 2),
+                                              end_date=date(2024, 1, 3), request_status=RequestStatus.ACCEPTED)
+        self.client.force_login(self.user)
+
+        response = self.client.get('/calender/data/2024/')
+        data = response.json()
+        self.assertEqual(data["absences"]["2024-01-02"], [user_request.pk])
+        self.assertEqual(data["users"][str(self.user.pk)], self.user.abbreviation)
+        self.assertEqual(data["holidays"]["2024-01-01"], ["Neujahr"])
+
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get('/calender/data/2024/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        user_request.delete()
+        response = self.client.get('/calender/data/2024/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["absences"], {})
+
+        self.assertEqual(self.client.get('/calender/data/0/').status_code, 404)
+        self.assertEqual(self.client.get('/calender/data/10000/').status_code, 404)
+
+    def test_etag_follows_user_changes(self):
+        Request.objects.create(requested_by=self.user, start_date=date(2024, 1, 2), end_date=date(2024, 1, 3),
+                               request_status=RequestStatus.ACCEPTED)
+        self.client.force_login(self.user)
+        etags = {path: self.client.get(path).headers['ETag'] for path in ('/calender/2024/', '/calender/data/2024/')}
+
+        # Kürzel stehen in den Monatszellen und im JSON, dort gibt es kein Request- oder Feiertagsdatum als Hinweis
+        self.user.abbreviation = 'NEU'
+        self.user.save()
+
+        for path, etag in etags.items():
+            response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'NEU')
+
+    def test_year_and_month_urls(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get('/calender/2024/', {'department': ''})
+        self.assertEqual(response.context["selected_year"], 2024)
+        self.assertEqual(response.context["previous_year_url"], '/calender/2023/?department=')
+        self.assertNotIn('selected_year', self.client.session)
+
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get('/calender/2024/', {'department': ''}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        response = self.client.get('/calender/2024/3/')
+        self.assertEqual([month["month_name"] for month in response.context["selected_year_dict"]["months"]], ["März"])
+        self.assertEqual(self.client.get('/calender/2024/13/').status_code, 404)
+        self.assertEqual(self.client.get('/calender/0/').status_code, 404)
+        self.assertEqual(self.client.get('/calender/10000/').status_code, 404)
+
+    async def test_async_views(self):
+        await Request.objects.acreate(requested_by=self.user, start_date=date(2024, 1, 2), end_date=date(2024, 1, 3),
+                                      request_status=RequestStatus.ACCEPTED)
+
+        request = AsyncRequestFactory().get('/calender/2024/')
+        request.user = self.user
+        response = await AsyncCalenderView.as_view()(request, year=2024)
+        await sync_to_async(response.render)()
+
+        sync_request = RequestFactory().get('/calender/2024/')
+        sync_request.user = self.user
+        sync_response = await sync_to_async(lambda: CalenderView.as_view()(sync_request, year=2024).render())()
+
+        self.assertEqual(response.content, sync_response.content)
+        self.assertEqual(response.headers['ETag'], sync_response.headers['ETag'])
+        self.assertContains(response, 'M0')
+
+        request = AsyncRequestFactory().get('/calender/0/')
+        request.user = self.user
+        with self.assertRaises(Http404):
+            await AsyncCalenderView.as_view()(request, year=0)
+
+        request = AsyncRequestFactory().get('/')
+        request.user = self.user
+        response = await AsyncLandingPageView.as_view()(request)
+        await sync_to_async(response.render)()
+        self.assertEqual(response.context_data['vacation_summary'].entitlement, 24)
+
+        request.user = AnonymousUser()
+        self.assertEqual((await AsyncLandingPageView.as_view()(request)).status_code, 302)
+
+    def test_query_count_is_constant(self):
+        self.create_requests(2)
+        few_requests = self.count_calender_queries()
+
+        self.create_requests(30)
+        many_requests = self.count_calender_queries()
+
+        self.assertEqual(few_requests, many_requests)
+
+    @override_settings(CALENDER_CACHE_ALIAS='default')
+    def test_month_fragments_are_cached(self):
+        user_request = Request.objects.create(requested_by=self.user, start_date=date(2024, 4, 29),
+                                              end_date=date(2024, 5, 3))
+        render_calender_months(2024, province=self.province.id, country='DE')
+
+        # Ein Kalenderjahr aus dem Cache braucht keine Datenbankabfragen
+        with self.assertNumQueries(0):
+            months = render_calender_months(2024, province=self.province.id, country='DE')
+        self.assertNotIn('M0', months[3]["html"])
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            user_request.request_status = RequestStatus.ACCEPTED
+            user_request.save()
+
+            # Vor dem Commit bleibt die alte Version gültig
+            with self.assertNumQueries(0):
+                render_calender_months(2024, province=self.province.id, country='DE')
+        self.assertEqual(len(callbacks), 1)
+
+        # Nach der Genehmigung werden nur April und Mai neu aufgebaut
+        with CaptureQueriesContext(connection) as queries:
+            months = render_calender_months(2024, province=self.province.id, country='DE')
+        self.assertEqual(len(queries), 1)
+        self.assertIn("'2024-05-31'", queries[0]['sql'])
+        self.assertIn("'2024-04-01'", queries[0]['sql'])
+        self.assertIn('M0', months[3]["html"])
+        self.assertIn('M0', months[4]["html"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            StandardHoliday.objects.create(name='Heilige Drei Könige', country='DE', province=self.province,
+                                           date=date(2024, 1, 6))
+        with CaptureQueriesContext(connection) as queries:
+            render_calender_months(2024, province=self.province.id, country='DE')
+        self.assertIn("'2024-01-31'", queries[0]['sql'])
+
+        # Ein neues Kürzel erscheint in April und Mai
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.abbreviation = 'XY'
+            self.user.save()
+        months = render_calender_months(2024, province=self.province.id, country='DE')
+        self.assertIn('XY', months[3]["html"])
+        self.assertIn('XY', months[4]["html"])
+
+
+class WorkdayTestCase(TestCase):
+    def test_count_weekdays(self):
+        self.assertEqual(count_weekdays(date(2024, 1, 1), date(2024, 1, 7)), 5)
+        self.assertEqual(count_weekdays(date(2024, 1, 6), date(2024, 1, 8)), 1)
+        self.assertEqual(count_weekdays(date(2024, 1, 1), date(2024, 12, 31)), 262)
+        self.assertEqual(count_weekdays(date(2024, 1, 8), date(2024, 1, 1)), 0)
+
+    def test_count_workdays_skips_weekday_holidays(self):
+        # Der 3. Oktober 2021 ist ein Sonntag und zählt deshalb nicht doppelt
+        holidays = workday_holidays([date(2021, 10, 3), date(2021, 11, 1), date(2021, 11, 1)])
+
+        self.assertEqual(holidays, [date(2021, 11, 1)])
+        self.assertEqual(count_workdays(date(2021, 9, 27), date(2021, 11, 5), holidays), 29)
+
+    def test_calculate_vacation_usage(self):
+        local_cache.clear()
+        province = Province.objects.create(name='Bayern', state_abreviation='BY', country='DE')
+        user = create_user(0, province=province, country='DE')
+        StandardHoliday.objects.create(name='Neujahr', country='DE', province=province, date=date(2024, 1, 1))
+
+        Request.objects.create(requested_by=user, start_date=date(2023, 12, 27), end_date=date(2024, 1, 5),
+                               request_status=RequestStatus.ACCEPTED)
+        Request.objects.create(requested_by=user, start_date=date(2024, 3, 4), end_date=date(2024, 3, 8))
+
+        with self.assertNumQueries(2):
+            self.assertEqual(calculate_vacation_usage(user, 2024), 4)
+
+
+class VacationSummaryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0, manual_vacation_correction=2)
+
+        Request.objects.create(requested_by=cls.user, start_date=date(2024, 1, 1), end_date=date(2024, 1, 5),
+                               request_status=RequestStatus.ACCEPTED)
+        Request.objects.create(requested_by=cls.user, start_date=date(2024, 2, 5), end_date=date(2024, 2, 6))
+        Request.objects.create(requested_by=cls.user, start_date=date(2024, 3, 4), end_date=date(2024, 3, 8),
+                               request_status=RequestStatus.DENIED)
+
+    def test_summary(self):
+        summary = calculate_vacation_summary(self.user, 2024)
+
+        self.assertEqual(summary.taken, 5)
+        self.assertEqual(summary.pending, 2)
+        self.assertEqual(summary.remaining, 24 - 5 + 2)
+        self.assertEqual(summary.remaining_after_pending, 24 - 5 + 2 - 2)
+
+    def test_summary_is_memoized_per_request(self):
+        http_request = RequestFactory().get('/')
+        summary = get_vacation_summary(http_request, self.user, 2024)
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_vacation_summary(http_request, self.user, 2024), summary)
+
+    def test_pages_show_summary(self):
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+
+        self.assertContains(self.client.get('/'), 'Resturlaub: 26 Tage')
+        self.assertContains(self.client.get('/manage/user/%s/' % self.user.pk), 'Resturlaub')
+        self.assertContains(self.client.get('/request_details/%s/' % self.user.requests.first().pk), 'Resturlaub')
+
+
+class VacationBalanceTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.province = Province.objects.create(name='Bayern', state_abreviation='BY', country='DE')
+        cls.other_province = Province.objects.create(name='Berlin', state_abreviation='BE', country='DE')
+        cls.user = create_user(0, province=cls.province, country='DE', is_staff=True, is_superuser=True)
+
+    def get_balance(self, year=2025):
+        balance = VacationBalance.objects.get(user=self.user, year=year)
+        return balance.days_taken, balance.days_pending
+
+    def test_balance_follows_request_workflow(self):
+        self.client.force_login(self.user)
+
+        self.client.post('/create/request/', {'start_date': '2025-12-29', 'end_date': '2026-01-02'})
+        user_request = Request.objects.get()
+        self.assertEqual(self.get_balance(2025), (0, 3))
+        self.assertEqual(self.get_balance(2026), (0, 2))
+
+        self.client.post('/request_details/%s/' % user_request.pk, {'approve': 'true'})
+        self.assertEqual(self.get_balance(2025), (3, 0))
+        self.assertEqual(self.get_balance(2026), (2, 0))
+
+        self.client.post('/create/request/', {'start_date': '2025-03-03', 'end_date': '2025-03-04'})
+        self.assertEqual(self.get_balance(2025), (3, 2))
+
+        self.client.post('/request_details/%s/' % Request.objects.latest('pk').pk, {'withdraw': 'true'})
+        self.assertEqual(self.get_balance(2025), (3, 0))
+
+    def test_balance_follows_holidays_and_province(self):
+        Request.objects.create(requested_by=self.user, start_date=date(2025, 12, 22), end_date=date(2025, 12, 26),
+                               request_status=RequestStatus.ACCEPTED)
+        call_command('rebuild_vacation_balances', year=[2025], stdout=StringIO())
+        self.assertEqual(self.get_balance(), (5, 0))
+
+        holiday = StandardHoliday.objects.create(name='1. Weihnachtstag', country='DE', province=self.province,
+                                                 date=date(2025, 12, 25))
+        self.assertEqual(self.get_balance(), (4, 0))
+
+        self.user.province = self.other_province
+        self.user.save()
+        self.assertEqual(self.get_balance(), (5, 0))
+
+        holiday.province = self.other_province
+        holiday.save()
+        self.assertEqual(self.get_balance(), (4, 0))
+
+    def test_stale_local_holidays_are_not_stored(self):
+        StandardHoliday.objects.create(name='1. Weihnachtstag', country='DE', province=self.province,
+                                       date=date(2025, 12, 25))
+
+        # Ein anderer Worker hat das Jahr vor dem neuen Feiertag gecacht und erfährt nichts von der Invalidierung
+        local_cache.set(('DE', self.province.pk, 2025), HolidayYear({}))
+        Request.objects.create(requested_by=self.user, start_date=date(2025, 12, 22), end_date=date(2025, 12, 26))
+        self.assertEqual(self.get_balance(), (0, 4))
+
+        Request.objects.create(requested_by=self.user, start_date=date(2025, 12, 29), end_date=date(2025, 12, 30))
+        self.assertEqual(self.get_balance(), (0, 6))
+
+    def test_create_request_validation(self):
+        Request.objects.create(requested_by=self.user, start_date=date(2025, 6, 2), end_date=date(2025, 6, 6),
+                               request_status=RequestStatus.ACCEPTED)
+        call_command('rebuild_vacation_balances', year=[2025], stdout=StringIO())
+        self.client.force_login(self.user)
+
+        response = self.client.post('/create/request/', {'start_date': '2025-06-06', 'end_date': '2025-06-10'})
+        self.assertIn('bereits einen offenen oder genehmigten Antrag', response.context['form'].non_field_errors()[0])
+
+        response = self.client.post('/create/request/', {'start_date': '2025-06-10', 'end_date': '2025-06-06'})
+        self.assertEqual(response.context['form'].errors['start_date'], ['Das Startdatum darf nicht nach dem Enddatum sein!'])
+
+        # 19 Tage sind noch frei, Juli 2025 hat 23 Arbeitstage
+        response = self.client.post('/create/request/', {'start_date': '2025-07-01', 'end_date': '2025-07-31'})
+        self.assertEqual(response.context['form'].non_field_errors(),
+                         ['Der Antrag umfasst 23 Arbeitstage in 2025, verfügbar sind nur noch 19 Tage.'])
+        self.assertEqual(Request.objects.count(), 1)
+
+        form = CreateRequestForm({'start_date': '2025-07-01', 'end_date': '2025-07-25'}, user=self.user)
+        with self.assertNumQueries(2):
+            self.assertTrue(form.is_valid())
+
+    def test_verify_command(self):
+        Request.objects.create(requested_by=self.user, start_date=date(2025, 6, 2), end_date=date(2025, 6, 3))
+        call_command('rebuild_vacation_balances', stdout=StringIO())
+        call_command('rebuild_vacation_balances', verify=True, stdout=StringIO())
+
+        VacationBalance.objects.filter(user=self.user, year=2025).update(days_pending=7)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_vacation_balances', verify=True, stdout=StringIO())
+
+        VacationBalance.objects.filter(user=self.user, year=2025).delete()
+        output = StringIO()
+        call_command('rebuild_vacation_balances', verify=True, stdout=output)
+        self.assertIn('User %s, 2025: no stored balance, expected 0/2' % self.user.pk, output.getvalue())
+
+    def test_orm_changes_update_balances(self):
+        # Änderungen außerhalb der Ansichten, z. B. im Admin
+        user_request = Request.objects.create(requested_by=self.user, start_date=date(2025, 6, 2),
+                                              end_date=date(2025, 6, 3))
+        self.assertEqual(self.get_balance(), (0, 2))
+
+        user_request.end_date = date(2025, 6, 6)
+        user_request.request_status = RequestStatus.ACCEPTED
+        user_request.save()
+        self.assertEqual(self.get_balance(), (5, 0))
+
+        user_request.declinement_reason = 'Notiz'
+        with self.assertNumQueries(2):
+            user_request.save()
+
+        user_request.delete()
+        self.assertEqual(self.get_balance(), (0, 0))
+        call_command('rebuild_vacation_balances', verify=True, stdout=StringIO())
+
+        Request.objects.create(requested_by=self.user, start_date=date(2025, 6, 2), end_date=date(2025, 6, 3))
+        self.user.delete()
+        self.assertFalse(VacationBalance.objects.exists())
+
+
+class QueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    query_budgets = {
+        '/': 7,
+        '/calender/': 7,
+        '/request_administration/': 7,
+        '/user_overview/': 5,
+        # Beim ersten Aufruf werden die fehlenden Bilanzen der Seite gemeinsam angelegt, mit den Feiertagen
+        # direkt aus der Datenbank
+        '/user_overview/?show_balance=on': 9,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.province = Province.objects.create(name='Bayern', state_abreviation='BY', country='DE')
+        cls.user = create_user(0, province=cls.province, country='DE', is_staff=True, is_superuser=True)
+
+        for number in range(1, 21):
+            requested_by = create_user(number, province=cls.province, country='DE')
+            Request.objects.create(requested_by=requested_by, acknowledged_by=cls.user, start_date=date.today(),
+                                   end_date=date.today(), request_status=RequestStatus.ACCEPTED)
+            Request.objects.create(requested_by=cls.user, start_date=date.today(), end_date=date.today())
+
+    def test_query_budgets(self):
+        self.client.force_login(self.user)
+        self.assertQueryBudgets()
+
+    def test_request_details(self):
+        self.client.force_login(self.user)
+        # Die fehlende Bilanz wird angelegt, die Feiertage dafür kommen nicht aus dem lokalen Cache
+        self.assertQueryBudget('/request_details/%s/' % Request.objects.accepted().first().pk, 7)
+
+
+class UserOverviewTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='Einkauf')
+        cls.user = create_user(0, is_staff=True, is_superuser=True)
+
+        for number in range(1, 61):
+            create_user(number, department=cls.department if number % 2 else None)
+
+    def test_search_and_pages(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get('/user_overview/')
+        self.assertEqual(response.context['paginator'].count, 61)
+        self.assertEqual(len(response.context['users']), 50)
+        self.assertEqual(response.context['next_page_query'], 'page=2')
+
+        response = self.client.get('/user_overview/', {'search': 'einkauf'})
+        self.assertEqual(response.context['paginator'].count, 30)
+        self.assertNotIn('next_page_query', response.context)
+
+        response = self.client.get('/user_overview/', {'search': 'M7'})
+        self.assertEqual([user.abbreviation for user in response.context['users']], ['M7'])
+
+    def test_employees_are_redirected(self):
+        # Personalnummern, Abteilungen und Resturlaub aller Mitarbeiter sind nur für die Personalabteilung
+        self.client.force_login(CustomUser.objects.get(abbreviation='M1'))
+
+        self.assertRedirects(self.client.get('/user_overview/', {'show_balance': 'on'}), '/')
+
+    def test_remaining_days_for_page(self):
+        Request.objects.create(requested_by=CustomUser.objects.get(abbreviation='M1'), start_date=date(date.today().year, 1, 5),
+                               end_date=date(date.today().year, 1, 5), request_status=RequestStatus.ACCEPTED)
+        self.client.force_login(self.user)
+
+        response = self.client.get('/user_overview/', {'search': 'M1', 'show_balance': 'on'})
+        self.assertEqual(response.context['users'][0].vacation_summary.remaining, 23)
+        self.assertContains(response, 'Resturlaub: 23 Tage')
+        self.assertEqual(VacationBalance.objects.count(), 1)
+
+
+class RequestAdministrationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='IT')
+        cls.user = create_user(0, is_staff=True, is_superuser=True)
+        cls.employee = create_user(1, department=cls.department)
+
+        for day in range(1, 29):
+            Request.objects.create(requested_by=cls.employee, start_date=date(2024, 2, day), end_date=date(2024, 2, day),
+                                   request_status=RequestStatus.ACCEPTED)
+            Request.objects.create(requested_by=cls.user, start_date=date(2024, 3, day), end_date=date(2024, 3, day),
+                                   request_status=RequestStatus.DENIED)
+        Request.objects.create(requested_by=cls.employee, start_date=date(2024, 5, 1), end_date=date(2024, 5, 2))
+
+    def test_keyset_pages(self):
+        requests = Request.objects.all()
+        first_page = keyset_page(requests, page_size=20)
+        second_page = keyset_page(requests, after=first_page.next_cursor, page_size=20)
+        last_page = keyset_page(requests, after=second_page.next_cursor, page_size=20)
+
+        self.assertEqual(len(first_page) + len(second_page) + len(last_page), requests.count())
+        self.assertIsNone(first_page.previous_cursor)
+        self.assertIsNone(last_page.next_cursor)
+
+        ordered = list(requests.order_by('-start_date', '-pk'))
+        self.assertEqual(first_page.items + second_page.items + last_page.items, ordered)
+
+        self.assertEqual(keyset_page(requests, before=second_page.previous_cursor, page_size=20).items, first_page.items)
+
+    def test_filters_and_queue(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get('/request_administration/')
+        self.assertEqual(len(response.context['new_requests']), 1)
+        self.assertEqual(response.context['request_count'], 56)
+        self.assertEqual(len(response.context['requests']), 30)
+
+        response = self.client.get('/request_administration/', {'department': self.department.pk, 'status': 'ACP',
+                                                               'date_from': '2024-02-10'})
+        self.assertNotIn('new_requests', response.context)
+        self.assertEqual(response.context['request_count'], 19)
+
+        response = self.client.get('/request_administration/', {'employee': 'M0'})
+        self.assertEqual(response.context['request_count'], 28)
+        self.assertEqual(response.context['new_request_count'], 0)
+
+    def test_bulk_approve(self):
+        new_request = Request.objects.get(request_status=RequestStatus.NEW)
+        second_request = Request.objects.create(requested_by=self.employee, start_date=date(2024, 5, 6),
+                                                end_date=date(2024, 5, 7))
+        accepted_request = Request.objects.filter(request_status=RequestStatus.ACCEPTED).first()
+        call_command('rebuild_vacation_balances', year=[2024], stdout=StringIO())
+        self.client.force_login(self.user)
+
+        response = self.client.post('/request_administration/', {
+            'action': 'approve', 'requests': [new_request.pk, second_request.pk, accepted_request.pk, 0]}, follow=True)
+
+        self.assertEqual(Request.objects.filter(request_status=RequestStatus.NEW).count(), 0)
+        self.assertEqual(set(Request.objects.filter(acknowledged_by=self.user).values_list('pk', flat=True)),
+                         {new_request.pk, second_request.pk})
+
+        balance = VacationBalance.objects.get(user=self.employee, year=2024)
+        self.assertEqual((balance.days_taken, balance.days_pending), (28 - 8 + 4, 0))
+
+        messages = [str(message) for message in response.context['messages']]
+        self.assertIn('2 Anträge genehmigt.', messages)
+        self.assertIn('1 Anträge wurden nicht gefunden.', messages)
+        self.assertEqual(len(messages), 3)
+
+        # Ein zweiter Versuch (z. B. ein anderer Bearbeiter) verbucht nichts doppelt
+        self.client.post('/request_administration/', {'action': 'decline', 'requests': [new_request.pk]})
+        self.assertEqual(Request.objects.get(pk=new_request.pk).request_status, RequestStatus.ACCEPTED)
+        self.assertEqual(VacationBalance.objects.get(user=self.employee, year=2024).days_taken, 24)
+
+    def test_single_action_uses_bulk_workflow(self):
+        new_request = Request.objects.get(request_status=RequestStatus.NEW)
+        call_command('rebuild_vacation_balances', year=[2024], stdout=StringIO())
+        self.client.force_login(self.user)
+
+        self.client.post('/request_administration/', {'action': 'approve', 'requests': [new_request.pk]})
+        days_taken = VacationBalance.objects.get(user=self.employee, year=2024).days_taken
+        response = self.client.post('/request_details/%s/' % new_request.pk, {'decline': 'true'}, follow=True)
+
+        self.assertEqual(Request.objects.get(pk=new_request.pk).request_status, RequestStatus.ACCEPTED)
+        self.assertEqual(VacationBalance.objects.get(user=self.employee, year=2024).days_taken, days_taken)
+        self.assertIn('Der Antrag wurde bereits bearbeitet.', [str(message) for message in response.context['messages']])
+
+    def test_actions_require_staff(self):
+        new_request = Request.objects.get(request_status=RequestStatus.NEW)
+        CustomUser.objects.filter(pk=self.user.pk).update(is_staff=False)
+        self.client.force_login(self.user)
+
+        self.client.post('/request_administration/', {'action': 'approve', 'requests': [new_request.pk]})
+        self.client.post('/request_details/%s/' % new_request.pk, {'approve': 'true'})
+        self.assertEqual(Request.objects.get(pk=new_request.pk).request_status, RequestStatus.NEW)
+
+
+class SyntheticDataTestCase(TestCase):
+    def test_generate_command(self):
+        call_command('generate_synthetic_data', employees=40, departments=3, years=2, stdout=StringIO())
+
+        self.assertEqual(CustomUser.objects.count(), 40)
+        self.assertEqual(Department.objects.count(), 3)
+        self.assertEqual(set(Request.objects.values_list('request_status', flat=True)), set(RequestStatus.values))
+        self.assertFalse(CustomUser.objects.filter(department=None).exists())
+        self.assertEqual(VacationBalance.objects.filter(year=date.today().year).count(), 40)
+
+        # Ein zweiter Lauf ergänzt neue Mitarbeiter und nutzt die vorhandenen Bundesländer
+        call_command('generate_synthetic_data', employees=10, departments=1, years=2, stdout=StringIO())
+        self.assertEqual(CustomUser.objects.count(), 50)
+        self.assertEqual(Province.objects.count(), 6)
+
+
+@override_settings(INSTRUMENTATION_ENABLED=True, INSTRUMENTATION_SLOW_REQUEST_MS=10000)
+class InstrumentationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user(0, is_staff=True, is_superuser=True)
+        cls.user = create_user(1)
+
+    def setUp(self):
+        view_statistics.clear()
+
+    def test_statistics_endpoint(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/calender/2024/')
+        self.assertIn('tpl;dur=', response.headers['Server-Timing'])
+
+        statistics = self.client.get('/performance/').json()
+        self.assertTrue(statistics["enabled"])
+        self.assertEqual(statistics["views"]["urlaubsantrag:CalenderYearView"]["count"], 1)
+        self.assertGreater(statistics["views"]["urlaubsantrag:CalenderYearView"]["template_ms"]["p50"], 0)
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/performance/').status_code, 302)
+
+    @override_settings(INSTRUMENTATION_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged(self):
+        self.client.force_login(self.admin)
+
+        with self.assertLogs('urlaubsantrag.performance', 'WARNING') as logs:
+            self.client.get('/user_overview/')
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["view"], 'urlaubsantrag:UserOverviewView')
+        self.assertGreater(record["queries"], 0)
+
+    def test_duplicate_queries(self):
+        recorder = QueryRecorder()
+
+        with connection.execute_wrapper(recorder):
+            for user in CustomUser.objects.all():
+                list(Request.objects.filter(requested_by=user))
+
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(recorder.duplicates(2)[0]["count"], 2)
+        self.assertEqual(recorder.duplicates(3), [])
+
+    @override_settings(INSTRUMENTATION_SLOW_REQUEST_MS=0)
+    async def test_async_requests(self):
+        async def get_response(request):
+            for _ in range(int(request.GET['queries'])):
+                await CustomUser.objects.acount()
+            return HttpResponse()
+
+        middleware = InstrumentationMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+
+        # Gleichzeitige Requests zählen nur ihre eigenen Abfragen
+        with self.assertLogs('urlaubsantrag.performance', 'WARNING') as logs:
+            responses = await asyncio.gather(*(middleware(AsyncRequestFactory().get('/', {'queries': queries}))
+                                               for queries in (1, 3)))
+
+        self.assertIn('db;dur=', responses[0].headers['Server-Timing'])
+        self.assertEqual(sorted(json.loads(record.getMessage())["queries"] for record in logs.records), [1, 3])
+
+
+class StaffingTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='IT', required_employees=3)
+        cls.admin = create_user(0, is_staff=True, is_superuser=True)
+        cls.employees = [create_user(number, department=cls.department) for number in range(1, 5)]
+
+        # Montag bis Mittwoch fehlt einer, am Dienstag zwei
+        Request.objects.create(requested_by=cls.employees[0], start_date=date(2024, 6, 3), end_date=date(2024, 6, 5),
+                               request_status=RequestStatus.ACCEPTED)
+        Request.objects.create(requested_by=cls.employees[1], start_date=date(2024, 6, 4), end_date=date(2024, 6, 4),
+                               request_status=RequestStatus.ACCEPTED)
+
+    def test_absence_profile(self):
+        profile = AbsenceProfile({1: [(date(2024, 6, 3), date(2024, 6, 5)), (date(2024, 6, 4), date(2024, 6, 6))],
+                                  2: [(date(2024, 6, 6), date(2024, 6, 6))]})
+
+        self.assertEqual([profile.absent_on(date(2024, 6, day)) for day in range(2, 8)], [0, 1, 1, 1, 2, 0])
+        self.assertTrue(profile.is_absent(1, date(2024, 6, 6)))
+
+    def test_queue_is_evaluated_in_one_pass(self):
+        shortage_request = Request.objects.create(requested_by=self.employees[2], start_date=date(2024, 6, 3),
+                                                  end_date=date(2024, 6, 7))
+        own_request = Request.objects.create(requested_by=self.employees[0], start_date=date(2024, 6, 5),
+                                             end_date=date(2024, 6, 6))
+        requests = list(Request.objects.with_users().filter(request_status=RequestStatus.NEW))
+
+        with self.assertNumQueries(2):
+            shortages = evaluate_requests(requests)
+
+        self.assertEqual([shortage.day for shortage in shortages[shortage_request.pk]], [date(2024, 6, 3), date(2024, 6, 4),
+                                                                                      date(2024, 6, 5)])
+        self.assertEqual(shortages[shortage_request.pk][1].available, 1)
+        # Am Mittwoch ist die Person ohnehin abwesend und zählt nicht doppelt
+        self.assertEqual(shortages[own_request.pk], [])
+
+    def test_detail_view(self):
+        user_request = Request.objects.create(requested_by=self.employees[2], start_date=date(2024, 6, 4),
+                                              end_date=date(2024, 6, 4))
+        self.client.force_login(self.admin)
+
+        response = self.client.get('/request_details/%s/' % user_request.pk)
+        self.assertContains(response, 'Unterbesetzung in IT')
+        self.assertEqual(len(response.context['staffing_shortages']), 1)
+
+        response = self.client.get('/request_administration/')
+        self.assertContains(response, 'Unterbesetzt an 1 Tag')
+
+
+class FeedTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.province = Province.objects.create(name='Bayern', state_abreviation='BY', country='DE')
+        cls.department = Department.objects.create(name='IT')
+        cls.user = create_user(0, province=cls.province, country='DE', department=cls.department)
+        cls.colleague = create_user(1, department=cls.department)
+
+        today = date.today()
+        StandardHoliday.objects.create(name='Neujahr', country='DE', province=cls.province, date=date(today.year, 1, 1))
+        cls.user_request = Request.objects.create(requested_by=cls.user, start_date=date(today.year, 3, 2),
+                                                  end_date=date(today.year, 3, 6), request_status=RequestStatus.ACCEPTED)
+        Request.objects.create(requested_by=cls.colleague, start_date=date(today.year, 4, 1),
+                               end_date=date(today.year, 4, 1), request_status=RequestStatus.ACCEPTED)
+        Request.objects.create(requested_by=cls.user, start_date=date(today.year, 5, 4), end_date=date(today.year, 5, 4))
+
+    def get_feed(self, kind, user, **headers):
+        response = self.client.get('/feeds/%s/%s.ics' % (kind, feed_token(kind, user)), **headers)
+        content = b''.join(response.streaming_content).decode() if response.status_code == 200 else ''
+        return response, content
+
+    def test_user_feed(self):
+        response, content = self.get_feed('user', self.user)
+
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertEqual(content.count('BEGIN:VEVENT'), 2)
+        self.assertIn('DTSTART;VALUE=DATE:%s0302\r\n' % date.today().year, content)
+        self.assertIn('DTEND;VALUE=DATE:%s0307' % date.today().year, content)
+        self.assertIn('SUMMARY:Neujahr', content)
+
+        with self.assertNumQueries(3):
+            response, content = self.get_feed('user', self.user, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        self.user_request.end_date = date(date.today().year, 3, 9)
+        self.user_request.save()
+        response, content = self.get_feed('user', self.user, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_department_feed_and_tokens(self):
+        response, content = self.get_feed('department', self.user)
+        self.assertEqual(content.count('BEGIN:VEVENT'), 2)
+        self.assertIn('Urlaub: Max Muster1', content)
+
+        self.assertEqual(self.client.get('/feeds/user/%s.ics' % feed_token('department', self.user)).status_code, 404)
+        self.assertEqual(self.client.get('/feeds/user/%s:falsch.ics' % self.user.pk).status_code, 404)
+
+    def test_revoked_tokens(self):
+        user_token, department_token = feed_token('user', self.user), feed_token('department', self.user)
+
+        # Abteilungswechsel beendet den Abteilungs-Feed, der eigene bleibt gültig
+        self.user.department = Department.objects.create(name='HR')
+        self.user.save()
+        self.assertEqual(self.client.get('/feeds/department/%s.ics' % department_token).status_code, 404)
+        self.assertEqual(self.client.get('/feeds/user/%s.ics' % user_token).status_code, 200)
+
+        self.client.force_login(self.user)
+        response = self.client.post('/feeds/rotate/', follow=True)
+        self.assertContains(response, 'Die Kalender-Links wurden erneuert')
+        self.assertEqual(self.client.get('/feeds/user/%s.ics' % user_token).status_code, 404)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.get_feed('user', self.user)[0].status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_feed('user', self.user)[0].status_code, 404)
+        self.assertEqual(self.get_feed('department', self.user)[0].status_code, 404)
+
+    def test_fold_line(self):
+        folded = fold_line('SUMMARY:' + 'ä' * 80)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in folded.split('\r\n')))
+        self.assertEqual(folded.replace('\r\n ', ''), 'SUMMARY:' + 'ä' * 80 + '\r\n')
+
+
+class ExportTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.province = Province.objects.create(name='Bayern', state_abreviation='BY', country='DE')
+        cls.admin = create_user(0, is_staff=True, is_superuser=True, staff_nr='100')
+        StandardHoliday.objects.create(name='Neujahr', country='DE', province=cls.province, date=date(2025, 1, 1))
+
+        for number in range(1, 8):
+            user = create_user(number, province=cls.province, country='DE', staff_nr=str(number))
+            Request.objects.create(requested_by=user, start_date=date(2024, 12, 30), end_date=date(2025, 1, 3),
+                                   request_status=RequestStatus.ACCEPTED)
+            Request.objects.create(requested_by=user, start_date=date(2025, 6, 2), end_date=date(2025, 6, 3))
+
+    def read_csv(self, response):
+        return [line.split(';') for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_request_export(self):
+        self.client.force_login(self.admin)
+        rows = self.read_csv(self.client.get('/export/requests.csv'))
+
+        self.assertEqual(rows[0][0], 'Antrag')
+        self.assertEqual(len(rows), 15)
+        # 30.12.2024 bis 03.01.2025 ohne Wochenende und Neujahr
+        self.assertEqual(rows[1][6:], ['2024-12-30', '2025-01-03', 'Genehmigt', '4'])
+
+        for year in ['0', '10000', 'abc']:
+            self.assertEqual(self.client.get('/export/requests.csv', {'year': year}).status_code, 404)
+            self.assertEqual(self.client.get('/export/balances.csv', {'year': year}).status_code, 404)
+
+    def test_balance_export_is_computed_per_chunk(self):
+        local_cache.clear()
+
+        # Benutzer, Feiertage und eine Antragsabfrage pro Block mit drei Benutzern
+        with self.assertNumQueries(1 + 1 + 3):
+            rows = list(export_balances(2025, chunk_size=3))
+
+        self.assertEqual(len(rows), 9)
+        self.assertEqual(rows[2].strip().split(';')[5:], ['2025', '24', '0', '0', '2', '2', '22'])
+
+        output = StringIO()
+        call_command('export_csv', 'balances', year=2025, stdout=output)
+        self.assertEqual(output.getvalue().splitlines(), [row.strip() for row in rows])
+
+
+class CarryoverTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.province = Province.objects.create(name='Bayern', state_abreviation='BY', country='DE')
+        cls.department = Department.objects.create(name='IT')
+        StandardHoliday.objects.create(name='Neujahr', country='DE', province=cls.province, date=date(2025, 1, 1))
+
+        cls.user = create_user(1, province=cls.province, country='DE', department=cls.department)
+        cls.colleague = create_user(2, vacation_entitlement=30, manual_vacation_correction=5)
+
+        # 30.12.2024 bis 10.01.2025: 7 Arbeitstage im Jahr 2025, der offene Antrag zählt nicht
+        Request.objects.create(requested_by=cls.user, start_date=date(2024, 12, 30), end_date=date(2025, 1, 10),
+                               request_status=RequestStatus.ACCEPTED)
+        Request.objects.create(requested_by=cls.user, start_date=date(2025, 6, 2), end_date=date(2025, 6, 6))
+        VacationCarryover.objects.create(user=cls.user, year=2025, days=3)
+
+    def test_year_close_is_idempotent(self):
+        with self.assertNumQueries(3):
+            carryovers = calculate_carryovers(closing_users(2025), 2025)
+
+        self.assertEqual({carryover.user_id: carryover.days for carryover in carryovers},
+                         {self.user.pk: 24 + 3 - 7, self.colleague.pk: 30})
+
+        for _ in range(2):
+            call_command('close_vacation_year', year=2025, stdout=StringIO())
+
+        self.assertEqual(VacationCarryover.objects.filter(year=2026).count(), 2)
+        self.assertEqual(VacationCarryover.objects.get(user=self.user, year=2026).days, 20)
+
+        with self.assertNumQueries(1):
+            summary = load_vacation_summary(self.user, 2026)
+        self.assertEqual((summary.carryover, summary.remaining), (20, 44))
+
+    def test_correction_is_not_carried_over(self):
+        for year in (2025, 2026):
+            call_command('close_vacation_year', year=year, stdout=StringIO())
+
+        # Ohne genommenen Urlaub wächst der Übertrag nur um den Anspruch, die Korrektur kommt nur einmal dazu
+        self.assertEqual(VacationCarryover.objects.get(user=self.colleague, year=2027).days, 60)
+        self.assertEqual(load_vacation_summary(self.colleague, 2027).remaining, 30 + 60 + 5)
+
+    def test_resume_and_max_days(self):
+        VacationCarryover.objects.create(user=self.colleague, year=2026, days=0)
+
+        call_command('close_vacation_year', year=2025, resume=True, max_days=5, stdout=StringIO())
+
+        self.assertEqual(VacationCarryover.objects.get(user=self.user, year=2026).days, 5)
+        self.assertEqual(calculate_vacation_summary(self.user, 2026).remaining, 29)
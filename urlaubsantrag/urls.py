@@ -8,15 +8,28 @@ from django.conf import settings
 
 app_name = 'urlaubsantrag'
 
+# Unter ASGI laufen die lesenden Seiten als async Views, unter WSGI bleiben die synchronen
+LandingPageView = views.AsyncLandingPageView if settings.ASYNC_VIEWS else views.LandingPageView
+CalenderView = views.AsyncCalenderView if settings.ASYNC_VIEWS else views.CalenderView
+
 urlpatterns = [
-    path('', views.LandingPageView.as_view(), name="LandingPageView"),
+    path('', LandingPageView.as_view(), name="LandingPageView"),
     path('create/request/', views.CreateRequestView.as_view(), name="RequestPageView"),
     path('request_administration/', views.RequestAdministrationView.as_view(), name="RequestAdministrationView"),
     path('request_details/<int:pk>/', views.RequestDetailView.as_view(), name="RequestDetailView"),
     path('create/user/', views.CreateUserView.as_view(), name="CreateUserView"),
     path('manage/user/<int:pk>/', views.ManageUserView.as_view(), name="ManageUserView"),
     path('user_overview/', views.UserOverviewView.as_view(), name="UserOverviewView"),
-    path('calender/', views.CalenderView.as_view(), name="CalenderView"),
+    path('calender/', CalenderView.as_view(), name="CalenderView"),
+    path('calender/<int:year>/', CalenderView.as_view(), name="CalenderYearView"),
+    path('calender/<int:year>/<int:month>/', CalenderView.as_view(), name="CalenderMonthView"),
+    path('calender/data/<int:year>/', views.CalenderDataView.as_view(), name="CalenderDataView"),
+    path('feeds/user/<str:token>.ics', views.FeedView.as_view(kind='user'), name="UserFeedView"),
+    path('feeds/department/<str:token>.ics', views.FeedView.as_view(kind='department'), name="DepartmentFeedView"),
+    path('feeds/rotate/', views.RotateFeedKeyView.as_view(), name="RotateFeedKeyView"),
+    path('export/requests.csv', views.ExportView.as_view(kind='requests'), name="RequestExportView"),
+    path('export/balances.csv', views.ExportView.as_view(kind='balances'), name="BalanceExportView"),
+    path('performance/', views.PerformanceView.as_view(), name="PerformanceView"),
     path('impressum/', views.ImpressumView.as_view(), name="ImpressumView"),
     path('datenschutz/', views.DatenschutzView.as_view(), name="DatenschutzView"),
     path('contact/', views.ContactView.as_view(), name="ContactView"),
@@ -0,0 +1,229 @@
+from collections import defaultdict
+from datetime import date
+
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.holiday_cache import get_holiday_dates as get_cached_holiday_dates
+from .models import Request, RequestStatus, VacationBalance, VacationCarryover
+from .workdays import get_holiday_dates, count_request_workdays, count_workdays, workday_holidays
+
+
+balance_fields = {
+    RequestStatus.ACCEPTED: 'days_taken',
+    RequestStatus.NEW: 'days_pending',
+}
+
+
+class VacationSummary:
+    def __init__(self, user, year, taken, pending, carryover=0):
+        self.user = user
+        self.year = year
+        self.entitlement = user.vacation_entitlement
+        self.correction = user.manual_vacation_correction
+        self.carryover = carryover
+        self.taken = taken
+        self.pending = pending
+
+    @property
+    def remaining(self):
+        return self.entitlement + self.carryover - self.taken + self.correction
+
+    @property
+    def remaining_after_pending(self):
+        return self.remaining - self.pending
+
+
+def calculate_vacation_summary(user, year=None):
+    if not year:
+        year = date.today().year
+
+    start_of_year = date(year, 1, 1)
+    end_of_year = date(year, 12, 31)
+
+    # Genehmigte und offene Anträge werden mit einer Abfrage geladen und danach aufgeteilt
+    user_requests = Request.objects.filter(requested_by=user, request_status__in=balance_fields)
+    user_requests = list(user_requests.in_range(start_of_year, end_of_year).only('start_date', 'end_date', 'request_status'))
+
+    holiday_dates = get_holiday_dates(user.province_id, user.country, start_of_year, end_of_year)
+
+    taken = count_request_workdays([request for request in user_requests if request.request_status == RequestStatus.ACCEPTED],
+                                   year, holiday_dates)
+    pending = count_request_workdays([request for request in user_requests if request.request_status == RequestStatus.NEW],
+                                     year, holiday_dates)
+
+    return VacationSummary(user, year, taken, pending, get_carryovers([user], year).get(user.pk, 0))
+
+
+def carryover_days(user=OuterRef('user'), year=OuterRef('year')):
+    # Als Unterabfrage kommt der Übertrag ohne zusätzliche Abfrage mit der Bilanz bzw. dem Benutzer
+    carryovers = VacationCarryover.objects.filter(user=user, year=year).values('days')[:1]
+    return Coalesce(Subquery(carryovers), 0)
+
+
+def get_carryovers(users, year):
+    return dict(VacationCarryover.objects.filter(user__in=users, year=year).values_list('user_id', 'days'))
+
+
+def create_vacation_balances(users, year):
+    # Der Jahresabschluss legt zu jedem Übertrag auch die Bilanz an, fehlende Bilanzen haben also keinen Übertrag
+    balances = update_vacation_balances(users, year)
+
+    for balance in balances.values():
+        balance.carryover = 0
+
+    return balances
+
+
+def load_vacation_summary(user, year=None):
+    if not year:
+        year = date.today().year
+
+    balance = VacationBalance.objects.filter(user=user, year=year).annotate(carryover=carryover_days()).first()
+
+    if balance is None:
+        balance = create_vacation_balances([user], year)[user.pk]
+
+    return VacationSummary(user, year, balance.days_taken, balance.days_pending, balance.carryover)
+
+
+def load_vacation_summaries(user, years):
+    balances = {balance.year: balance for balance in VacationBalance.objects.filter(user=user, year__in=years)
+                .annotate(carryover=carryover_days())}
+
+    for year in years:
+        if year not in balances:
+            balances[year] = create_vacation_balances([user], year)[user.pk]
+
+    return {year: VacationSummary(user, year, balances[year].days_taken, balances[year].days_pending,
+                                  balances[year].carryover) for year in years}
+
+
+def load_page_vacation_summaries(users, year):
+    # Eine Abfrage für alle Benutzer einer Seite, fehlende Bilanzen werden gemeinsam berechnet
+    users = {user.pk: user for user in users}
+    balances = {balance.user_id: balance for balance in VacationBalance.objects.filter(user__in=users, year=year)
+                .only('user_id', 'days_taken', 'days_pending').annotate(carryover=carryover_days())}
+
+    missing = [user for user_id, user in users.items() if user_id not in balances]
+    if missing:
+        balances.update(create_vacation_balances(missing, year))
+
+    return {user_id: VacationSummary(user, year, balances[user_id].days_taken, balances[user_id].days_pending,
+                                     balances[user_id].carryover)
+            for user_id, user in users.items()}
+
+
+def get_vacation_summary(http_request, user, year=None):
+    if not year:
+        year = date.today().year
+
+    # Pro HTTP-Request wird jede Bilanz nur einmal berechnet
+    if not hasattr(http_request, '_vacation_summaries'):
+        http_request._vacation_summaries = {}
+
+    key = (user.pk, year)
+    if key not in http_request._vacation_summaries:
+        http_request._vacation_summaries[key] = load_vacation_summary(user, year)
+
+    return http_request._vacation_summaries[key]
+
+
+class VacationSummaryMixin:
+    def get_vacation_summary_user(self):
+        return self.request.user
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['vacation_summary'] = get_vacation_summary(self.request, self.get_vacation_summary_user())
+        return context
+
+
+def calculate_balances(users, year, fresh=False):
+    start_of_year = date(year, 1, 1)
+    end_of_year = date(year, 12, 31)
+
+    users = {user.pk: user for user in users}
+    balances = {user_id: {'days_taken': 0, 'days_pending': 0} for user_id in users}
+
+    holiday_dates = {}
+    for user in users.values():
+        key = (user.province_id, str(user.country or ''))
+        if key not in holiday_dates:
+            holiday_dates[key] = workday_holidays(get_cached_holiday_dates(user.country, user.province_id, year, fresh))
+
+    user_requests = Request.objects.filter(requested_by__in=users, request_status__in=balance_fields)
+    user_requests = user_requests.in_range(start_of_year, end_of_year).values_list('requested_by_id', 'start_date',
+                                                                                    'end_date', 'request_status')
+
+    for user_id, start_date, end_date, request_status in user_requests:
+        user = users[user_id]
+        holidays = holiday_dates[(user.province_id, str(user.country or ''))]
+
+        balances[user_id][balance_fields[request_status]] += count_workdays(max(start_date, start_of_year),
+                                                                            min(end_date, end_of_year), holidays)
+
+    return balances
+
+
+def update_vacation_balances(users, year):
+    # Gespeicherte Bilanzen dürfen keine veralteten Feiertage aus dem lokalen Cache eines Workers enthalten
+    balances = [VacationBalance(user_id=user_id, year=year, **values)
+                for user_id, values in calculate_balances(users, year, fresh=True).items()]
+
+    VacationBalance.objects.bulk_create(balances, update_conflicts=True, unique_fields=['user', 'year'],
+                                        update_fields=['days_taken', 'days_pending'])
+
+    return {balance.user_id: balance for balance in balances}
+
+
+def request_workdays_by_year(request, user):
+    holiday_dates = get_holiday_dates(user.province_id, user.country, request.start_date, request.end_date)
+
+    return {year: count_workdays(max(request.start_date, date(year, 1, 1)), min(request.end_date, date(year, 12, 31)),
+                                 holiday_dates)
+            for year in range(request.start_date.year, request.end_date.year + 1)}
+
+
+def add_request_days(changes, user, start_date, end_date, status, sign=1):
+    field = balance_fields.get(status)
+    if field is None:
+        return
+
+    # Die Tage werden per F() dauerhaft verbucht, deshalb ohne den lokalen Feiertags-Cache
+    holiday_dates = get_holiday_dates(user.province_id, user.country, start_date, end_date, fresh=True)
+
+    for year in range(start_date.year, end_date.year + 1):
+        changes[user.pk, year][field] += sign * count_workdays(max(start_date, date(year, 1, 1)),
+                                                               min(end_date, date(year, 12, 31)), holiday_dates)
+
+
+def apply_balance_changes(changes, users, create_missing=True):
+    # Ein UPDATE pro (Benutzer, Jahr) in der Transaktion der Änderung; fehlt die Bilanz, wird sie aus dem
+    # bereits gespeicherten Stand berechnet
+    for (user_id, year), fields in changes.items():
+        updates = {field: F(field) + days for field, days in fields.items() if days}
+        if not updates:
+            continue
+
+        if not VacationBalance.objects.filter(user_id=user_id, year=year).update(**updates) and create_missing:
+            update_vacation_balances([users[user_id]], year)
+
+
+def balance_changes():
+    return defaultdict(lambda: defaultdict(int))
+
+
+def recalculate_vacation_balances(users, years=None):
+    users = {user.pk: user for user in users}
+
+    balances = VacationBalance.objects.filter(user__in=users)
+    if years is not None:
+        balances = balances.filter(year__in=years)
+
+    users_by_year = defaultdict(list)
+    for user_id, year in balances.values_list('user_id', 'year'):
+        users_by_year[year].append(users[user_id])
+
+    for year, year_users in users_by_year.items():
+        update_vacation_balances(year_users, year)
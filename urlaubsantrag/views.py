@@ -2,13 +2,30 @@ from django.shortcuts import render
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views import generic
 from .models import Request, RequestStatus
-from .forms import CreateRequestForm, ManageRequestForm, CreateUserForm, ManageUserForm
-from django.shortcuts import redirect
-from users.models import CustomUser, StandardHoliday
-import copy
-from datetime import timedelta, date, datetime
-import calendar
-import holidays
+from .forms import CreateRequestForm, ManageRequestForm, CreateUserForm, ManageUserForm, RequestFilterForm, \
+    CalenderFilterForm, BulkRequestActionForm, UserFilterForm
+from django.shortcuts import get_object_or_404, redirect
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.conf import settings
+from django.contrib import messages
+from django.db import transaction
+from users.models import CustomUser, Department
+from .calender import alist, build_calender_data, calender_version
+from .calender_cache import arender_calender_months, render_calender_months
+from .workdays import get_holiday_dates, count_request_workdays
+from .vacation import VacationSummaryMixin, get_vacation_summary, load_page_vacation_summaries
+from .pagination import keyset_page
+from .instrumentation import view_statistics
+from .workflow import bulk_update_status, can_acknowledge
+from .staffing import evaluate_request, evaluate_requests
+from .export import export_balances, export_requests
+from .ics import feed_holidays, feed_requests, feed_token, feed_user, feed_version, feed_window, generate_feed
+from datetime import MAXYEAR, MINYEAR, date, datetime
+import asyncio
+from asgiref.sync import sync_to_async
 import pprint
 from django.contrib.auth import get_user_model
 
@@ -16,16 +33,6 @@ User = get_user_model()
 # Create your views here.
 
 
-def calculate_remaining_vacation_days(user, year=None):
-    if not year:
-        year = date.today().year
-
-    used_vacation_days = calculate_vacation_usage(user=user, year=year)
-    remaining_vacation_days = user.vacation_entitlement
-
-    return remaining_vacation_days - used_vacation_days + user.manual_vacation_correction
-
-
 def calculate_vacation_usage(user, year=None):
     if not year:
         year = date.today().year
@@ -33,41 +40,19 @@ def calculate_vacation_usage(user, year=None):
     start_of_year = date(year, 1, 1)
     end_of_year = date(year, 12, 31)
 
-    user_request_current_year = Request.objects.filter(requested_by=user, request_status=RequestStatus.ACCEPTED,
-                                                       start_date__lte=end_of_year, end_date__gte=start_of_year)
-
-    vacation_taken = 0
-
-    for request in user_request_current_year:
-        start_date = max(request.start_date, start_of_year)
-        end_date = min(request.end_date, end_of_year)
+    user_request_current_year = Request.objects.filter(requested_by=user).accepted().in_range(start_of_year, end_of_year)
 
-        current_date = start_date
+    holiday_dates = get_holiday_dates(user.province_id, user.country, start_of_year, end_of_year)
 
-        while current_date <= end_date:
-            if not StandardHoliday.objects.filter(date=current_date, province=user.province, country=user.country).exists():
-                if current_date.weekday() in [0, 1, 2, 3, 4]:
-                    vacation_taken += 1
+    return count_request_workdays(user_request_current_year, year, holiday_dates)
 
-            current_date += timedelta(days=1)
 
-    return vacation_taken
+def validate_year(year):
+    # date() kennt nur die Jahre 1 bis 9999, Vor- und Folgejahr müssen ebenfalls gültig sein
+    if not MINYEAR < year < MAXYEAR:
+        raise Http404
 
-
-month_names_german = {
-            'January': 'Januar',
-            'February': 'Februar',
-            'March': 'März',
-            'April': 'April',
-            'May': 'Mai',
-            'June': 'Juni',
-            'July': 'Juli',
-            'August': 'August',
-            'September': 'September',
-            'October': 'Oktober',
-            'November': 'November',
-            'December': 'Dezember'
-        }
+    return year
 
 
 class CheckPermissionMixin:
@@ -80,7 +65,7 @@ class CheckPermissionMixin:
             return redirect("/")
 
 
-class LandingPageView(LoginRequiredMixin, generic.TemplateView):
+class LandingPageView(LoginRequiredMixin, VacationSummaryMixin, generic.TemplateView):
     login_url = '/login/'
     template_name = "urlaubsantrag/landingpage.html"
 
@@ -88,13 +73,52 @@ class LandingPageView(LoginRequiredMixin, generic.TemplateView):
         context = super().get_context_data(**kwargs)
         user: CustomUser = self.request.user
 
-        context['requests'] = Request.objects.filter(requested_by=user)
-        context['vacation_entitlement'] = user.vacation_entitlement
-        context['vacation_taken'] = calculate_vacation_usage(user=user)
-        context['remaining_vacation'] = calculate_remaining_vacation_days(user=user)
+        context.update(self.get_landing_context(context['vacation_summary'], Request.objects.history_for(user)))
 
         return context
 
+    def get_landing_context(self, vacation_summary, requests):
+        user = self.request.user
+        context = {
+            'vacation_summary': vacation_summary,
+            'requests': requests,
+            'vacation_entitlement': vacation_summary.entitlement,
+            'vacation_taken': vacation_summary.taken,
+            'remaining_vacation': vacation_summary.remaining,
+        }
+
+        context['user_feed_url'] = self.request.build_absolute_uri(
+            reverse('urlaubsantrag:UserFeedView', args=[feed_token('user', user)]))
+        if user.department_id:
+            context['department_feed_url'] = self.request.build_absolute_uri(
+                reverse('urlaubsantrag:DepartmentFeedView', args=[feed_token('department', user)]))
+
+        return context
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    # Der Benutzer wird lazy aus der Session geladen, im Event-Loop darf das nur über einen Thread passieren
+    async def dispatch(self, request, *args, **kwargs):
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return self.handle_no_permission()
+
+        return await generic.View.dispatch(self, request, *args, **kwargs)
+
+
+class AsyncLandingPageView(AsyncLoginRequiredMixin, LandingPageView):
+    async def get(self, request, *args, **kwargs):
+        user = request.user
+
+        vacation_summary, requests = await asyncio.gather(
+            sync_to_async(get_vacation_summary)(request, user),
+            alist(Request.objects.history_for(user)),
+        )
+
+        context = self.get_landing_context(vacation_summary, requests)
+        context.update(generic.base.ContextMixin.get_context_data(self, **kwargs))
+
+        return self.render_to_response(context)
+
 
 class ImpressumView(generic.TemplateView):
     template_name = "urlaubsantrag/impressum.html"
@@ -111,17 +135,18 @@ class CreateRequestView(LoginRequiredMixin, generic.CreateView):
     model = Request
     form_class = CreateRequestForm
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
     def form_valid(self, form):
         new_request = form.save(commit=False)
-        request_start_date = form.cleaned_data["start_date"]
-        request_end_date = form.cleaned_data["end_date"]
-
-        if request_start_date > request_end_date:
-            form.add_error("start_date", "Das Startdatum darf nicht nach dem Enddatum sein!")
-            return self.form_invalid(form)
-
         new_request.requested_by = self.request.user
-        new_request.save()
+
+        # Die Bilanz wird über die Signale des Antrags in derselben Transaktion fortgeschrieben
+        with transaction.atomic():
+            new_request.save()
 
         return super().form_valid(form)
 
@@ -132,48 +157,108 @@ class CreateRequestView(LoginRequiredMixin, generic.CreateView):
 class RequestAdministrationView(LoginRequiredMixin, CheckPermissionMixin, generic.TemplateView):
     login_url = '/login/'
     template_name = "urlaubsantrag/request_administration.html"
+    page_size = 30
+    queue_size = 50
+
+    def get_page_query(self, cursor_name, cursor):
+        query = self.request.GET.copy()
+        query.pop('after', None)
+        query.pop('before', None)
+        query[cursor_name] = cursor
+        return query.urlencode()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
 
-        context['requests'] = Request.objects.all().order_by("-start_date")
+        filter_form = RequestFilterForm(self.request.GET or None)
+        requests = filter_form.filter(Request.objects.for_administration())
+        status = filter_form.cleaned_data.get('status') if filter_form.is_bound and filter_form.is_valid() else ''
+        after = self.request.GET.get('after')
+        before = self.request.GET.get('before')
+
+        # Ohne Statusfilter stehen die offenen Anträge als Warteschlange über der Liste
+        if not status:
+            if not after and not before:
+                new_requests = list(requests.filter(request_status=RequestStatus.NEW).order_by('start_date', 'pk')[:self.queue_size])
+                shortages = evaluate_requests(new_requests)
+                for new_request in new_requests:
+                    new_request.staffing_shortages = shortages.get(new_request.pk, [])
+                context['new_requests'] = new_requests
+            context['new_request_count'] = requests.filter(request_status=RequestStatus.NEW).count()
+            requests = requests.exclude(request_status=RequestStatus.NEW)
+
+        page = keyset_page(requests, after=after, before=before, page_size=self.page_size)
+
+        context['filter_form'] = filter_form
+        context['requests'] = page
+        context['request_count'] = requests.count()
+        if page.next_cursor:
+            context['next_page_query'] = self.get_page_query('after', page.next_cursor)
+        if page.previous_cursor:
+            context['previous_page_query'] = self.get_page_query('before', page.previous_cursor)
 
         return context
 
+    def post(self, request, *args, **kwargs):
+        form = BulkRequestActionForm(request.POST)
+
+        if not can_acknowledge(request.user):
+            messages.error(request, 'Keine Berechtigung, Anträge zu bearbeiten.')
+            return redirect(request.get_full_path())
+
+        if not form.is_valid():
+            for errors in form.errors.values():
+                messages.error(request, ' '.join(errors))
+            return redirect(request.get_full_path())
+
+        result = bulk_update_status(form.cleaned_data['requests'], form.get_status(), request.user)
+
+        if result.processed:
+            messages.success(request, '%s Anträge %s.' % (len(result.processed), 'genehmigt'
+                             if form.get_status() == RequestStatus.ACCEPTED else 'abgelehnt'))
+        for user_request in result.skipped:
+            messages.warning(request, 'Antrag von %s (%s - %s) wurde bereits bearbeitet: %s.' % (
+                user_request.requested_by.get_full_name(), user_request.start_date.strftime('%d.%m.%Y'),
+                user_request.end_date.strftime('%d.%m.%Y'), user_request.get_request_status_display()))
+        if result.missing:
+            messages.warning(request, '%s Anträge wurden nicht gefunden.' % len(result.missing))
+
+        return redirect(request.get_full_path())
+
 
-class RequestDetailView(LoginRequiredMixin, CheckPermissionMixin, generic.DetailView):
+class RequestDetailView(LoginRequiredMixin, CheckPermissionMixin, VacationSummaryMixin, generic.DetailView):
     login_url = '/login/'
     template_name = "urlaubsantrag/request_details.html"
     model = Request
+    queryset = Request.objects.with_users()
+
+    def get_vacation_summary_user(self):
+        return self.object.requested_by
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['confirm_button'] = True
+        context['staffing_shortages'] = evaluate_request(self.object)
         return context
 
     def post(self, request, *args, **kwargs):
         user_request = self.get_object()
 
         if 'withdraw' in request.POST:
-            if user_request.request_status == RequestStatus.NEW:
-                if user_request.requested_by == self.request.user:
-                    user_request.delete()
+            if user_request.requested_by == self.request.user:
+                with transaction.atomic():
+                    # Nur solange der Antrag noch offen ist, auch wenn er inzwischen bearbeitet wurde
+                    Request.objects.filter(pk=user_request.pk, request_status=RequestStatus.NEW).delete()
 
             return redirect('/request_administration/')
 
-        elif 'decline' in request.POST:
-            if user_request.request_status == RequestStatus.NEW:
-                if self.request.user.is_staff:
-                    user_request.request_status = RequestStatus.DENIED
-                    user_request.save()
-            return redirect('/request_administration/')
+        elif 'decline' in request.POST or 'approve' in request.POST:
+            if can_acknowledge(self.request.user):
+                new_status = RequestStatus.ACCEPTED if 'approve' in request.POST else RequestStatus.DENIED
 
-        elif 'approve' in request.POST:
-            if user_request.request_status == RequestStatus.NEW:
-                if self.request.user.is_staff:
-                    user_request.request_status = RequestStatus.ACCEPTED
-                    user_request.save()
+                # Derselbe Weg wie die Sammelbearbeitung, damit parallele Bearbeitungen nicht doppelt verbucht werden
+                if bulk_update_status([user_request.pk], new_status, self.request.user).skipped:
+                    messages.warning(request, 'Der Antrag wurde bereits bearbeitet.')
             return redirect('/request_administration/')
 
         else:
@@ -204,12 +289,15 @@ class CreateUserView(LoginRequiredMixin, generic.CreateView):
         return self.render_to_response(self.get_context_data(form=form))
 
 
-class ManageUserView(LoginRequiredMixin, generic.UpdateView):
+class ManageUserView(LoginRequiredMixin, VacationSummaryMixin, generic.UpdateView):
     login_url = '/login/'
     template_name = "urlaubsantrag/manage_user.html"
     model = CustomUser
     form_class = ManageUserForm
 
+    def get_vacation_summary_user(self):
+        return self.object
+
     def form_valid(self, form):
         new_user = form.save(commit=False)
         old_user_object = self.get_object()
@@ -235,15 +323,41 @@ class ManageUserView(LoginRequiredMixin, generic.UpdateView):
         return self.render_to_response(self.get_context_data(form=form))
 
 
-class UserOverviewView(LoginRequiredMixin, generic.TemplateView):
+class UserOverviewView(LoginRequiredMixin, CheckPermissionMixin, generic.ListView):
     login_url = '/login/'
     template_name = "urlaubsantrag/user_overview.html"
+    context_object_name = 'users'
+    paginate_by = 50
+
+    def get_queryset(self):
+        self.filter_form = UserFilterForm(self.request.GET or None)
+
+        # Nur die angezeigten Spalten, insbesondere ohne Passwort-Hash
+        users = CustomUser.objects.select_related('department').only(
+            'first_name', 'last_name', 'abbreviation', 'staff_nr', 'department__name', 'province_id', 'country',
+            'vacation_entitlement', 'manual_vacation_correction').order_by('last_name', 'first_name', 'pk')
+
+        return self.filter_form.filter(users)
+
+    def get_page_query(self, page_number):
+        query = self.request.GET.copy()
+        query['page'] = page_number
+        return query.urlencode()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
+        page = context['page_obj']
+
+        context['filter_form'] = self.filter_form
+        if page.has_previous():
+            context['previous_page_query'] = self.get_page_query(page.previous_page_number())
+        if page.has_next():
+            context['next_page_query'] = self.get_page_query(page.next_page_number())
 
-        context['users'] = CustomUser.objects.all()
+        if self.filter_form.wants_balance():
+            summaries = load_page_vacation_summaries(context['users'], date.today().year)
+            for user in context['users']:
+                user.vacation_summary = summaries[user.pk]
 
         return context
 
@@ -252,106 +366,185 @@ class CalenderView(LoginRequiredMixin, generic.TemplateView):
     login_url = '/login/'
     template_name = "urlaubsantrag/calender.html"
 
-    def post(self, request, *args, **kwargs):
+    def get_selected_year(self):
+        year = self.kwargs.get('year')
+        return datetime.now().year if year is None else validate_year(year)
+
+    def get_selected_months(self, filter_form):
+        if 'month' in self.kwargs:
+            return [self.kwargs['month']]
+
+        return filter_form.get_months()
 
-        year_selection = request.POST.get('year_selection')
+    def get_calender_url(self, year):
+        url = reverse('urlaubsantrag:CalenderYearView', args=[year])
+        return '%s?%s' % (url, self.request.GET.urlencode()) if self.request.GET else url
 
-        if year_selection == "next_year":
-            current_year = self.request.session.get('selected_year')
+    def get(self, request, *args, **kwargs):
+        if not 1 <= kwargs.get('month', 1) <= 12:
+            raise Http404
 
-            current_year += 1
+        # Jahr und Zeitraum stehen in der URL, die Seite kann per ETag revalidiert werden
+        etag = self.get_calender_etag(request)
+        response = get_conditional_response(request, etag=etag)
 
-            self.request.session['selected_year'] = current_year
+        if response is None:
+            response = super().get(request, *args, **kwargs)
 
-        if year_selection == "previous_year":
-            current_year = self.request.session.get('selected_year')
+        response.headers['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
 
-            current_year -= 1
+        return response
 
-            self.request.session['selected_year'] = current_year
+    def get_calender_etag(self, request):
+        user = request.user
+        self.filter_form = CalenderFilterForm(request.GET or None)
 
-        return redirect('.')
+        # Die eigene Abteilung steckt im Link "Meine Abteilung"
+        return quote_etag('%s-%s-%s-%s' % (user.pk, user.department_id, request.get_full_path(), calender_version(
+            self.get_selected_year(), province=user.province_id, country=user.country,
+            department=self.filter_form.get_department())))
 
     def get_context_data(self, **kwargs):
+        calender_months = kwargs.pop('calender_months', None)
         context = super().get_context_data(**kwargs)
+        user = self.request.user
+        selected_year = self.get_selected_year()
 
-        if not self.request.session.get('selected_year'):
-            context["selected_year"] = datetime.now().year
-            self.request.session['selected_year'] = context["selected_year"]
-        else:
-            context["selected_year"] = self.request.session.get('selected_year')
+        if calender_months is None:
+            calender_months = render_calender_months(selected_year, self.get_selected_months(self.filter_form),
+                                                     province=user.province_id, country=user.country,
+                                                     department=self.filter_form.get_department())
 
-        year_dict = {"year": context["selected_year"], "months": []}
+        context["selected_year"] = selected_year
+        context["previous_year_url"] = self.get_calender_url(selected_year - 1)
+        context["next_year_url"] = self.get_calender_url(selected_year + 1)
+        context["filter_form"] = self.filter_form
+        context["selected_year_dict"] = {"year": selected_year, "months": calender_months}
 
-        month_dict = {
-            "month_name": None,
-            "month_number": None,
-            "weeks": [],
-        }
+        return context
 
-        day_dict = {
-            "day_name": None,
-            "day_number": None,
-            "day_date": None,
-            "entries": None,
-            "holiday": None,
-        }
 
-        day_names = ['MO', 'DI', 'MI', 'DO', 'FR', 'SA', 'SO']
+class AsyncCalenderView(AsyncLoginRequiredMixin, CalenderView):
+    async def get(self, request, *args, **kwargs):
+        if not 1 <= kwargs.get('month', 1) <= 12:
+            raise Http404
+
+        user = request.user
+        etag = await sync_to_async(self.get_calender_etag)(request)
+        response = get_conditional_response(request, etag=etag)
 
-        first_day_of_year = date(year_dict["year"], 1, 1)
-        last_day_of_year = date(year_dict["year"], 12, 31)
+        if response is None:
+            calender_months = await arender_calender_months(
+                self.get_selected_year(), self.get_selected_months(self.filter_form), province=user.province_id,
+                country=user.country, department=self.filter_form.get_department())
+            response = self.render_to_response(self.get_context_data(calender_months=calender_months, **kwargs))
 
-        all_requests_year = Request.objects.filter(start_date__lte=last_day_of_year, end_date__gte=first_day_of_year, request_status=RequestStatus.ACCEPTED)
+        response.headers['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
 
-        request_range = [
-            (request.start_date, request.end_date) for request in all_requests_year
-        ]
+        return response
 
-        for month in range(1, 13):
-            current_month_dict = copy.deepcopy(month_dict)
 
-            first_day = date(year_dict["year"], month, 1)
-            last_day = date(year_dict["year"], month, calendar.monthrange(year_dict["year"], month)[1])
+class CalenderDataView(LoginRequiredMixin, generic.View):
+    login_url = '/login/'
 
-            current_month_dict["month_name"] = month_names_german.get(first_day.strftime('%B'), '')
-            current_month_dict["month_number"] = month
+    def get(self, request, year, *args, **kwargs):
+        year = validate_year(year)
+        user = self.request.user
+        department = CalenderFilterForm(self.request.GET or None).get_department()
 
-            current_day = first_day
+        # Der Browser fragt mit If-None-Match nach und bekommt ohne Änderungen nur ein 304
+        etag = quote_etag(calender_version(year, province=user.province_id, country=user.country, department=department))
+        response = get_conditional_response(request, etag=etag)
 
-            week_dict = {}
+        if response is None:
+            response = JsonResponse(build_calender_data(year, province=user.province_id, country=user.country,
+                                                        department=department))
 
-            while current_day <= last_day:
+        response.headers['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
 
-                current_day_number = current_day.strftime('%d')
-                current_date_day = day_names[current_day.weekday()]
-                current_day_date = current_day.strftime('%Y-%m-%d')
+        return response
 
-                try:
-                    current_week_dict[current_date_day] = copy.deepcopy(day_dict)
-                except:
-                    current_week_dict = copy.deepcopy(week_dict)
-                    current_week_dict[current_date_day] = copy.deepcopy(day_dict)
 
-                current_week_dict[current_date_day]["day_name"] = current_date_day
-                current_week_dict[current_date_day]["day_number"] = current_day_number
-                current_week_dict[current_date_day]["day_date"] = current_day_date
-                
-                current_week_dict[current_date_day]["entries"] = all_requests_year.filter(start_date__lte=current_day, end_date__gte=current_day)
-                current_week_dict[current_date_day]["holiday"] = StandardHoliday.objects.filter(date=current_day, province=self.request.user.province, country=self.request.user.country)
+class PerformanceView(LoginRequiredMixin, CheckPermissionMixin, generic.View):
+    login_url = '/login/'
 
-                if current_day.weekday() == 6 or current_day == last_day:
-                    current_month_dict["weeks"].append(current_week_dict)
-                    current_week_dict = None
+    def get(self, request, *args, **kwargs):
+        response = JsonResponse({"enabled": settings.INSTRUMENTATION_ENABLED, "views": view_statistics.summary()})
+        patch_cache_control(response, private=True, no_store=True)
 
-                current_day += timedelta(days=1)
-            year_dict["months"].append(current_month_dict)
+        return response
 
-        context["selected_year_dict"] = year_dict
 
-        return context
+class FeedView(generic.View):
+    # Kalender-Clients melden sich nicht an, der signierte Token in der URL ersetzt das Login
+    kind = None
+
+    def get_feed(self, user):
+        first_day, last_day = feed_window()
+
+        if self.kind == 'user':
+            return (user.get_full_name(), feed_requests(first_day, last_day, user=user),
+                    feed_holidays(first_day, last_day, user=user))
+
+        department = get_object_or_404(Department, pk=user.department_id)
+        return (department.name, feed_requests(first_day, last_day, department=department),
+                feed_holidays(first_day, last_day))
+
+    def get(self, request, token, *args, **kwargs):
+        # Ungültige, zurückgesetzte und Tokens deaktivierter Benutzer
+        user = feed_user(self.kind, token)
+        if user is None:
+            raise Http404
+
+        name, requests, holidays = self.get_feed(user)
+        version, last_modified = feed_version(requests, holidays)
+        etag = quote_etag(version)
+        last_modified = int(last_modified.timestamp()) if last_modified else None
 
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = StreamingHttpResponse(generate_feed(name, requests, holidays),
+                                             content_type='text/calendar; charset=utf-8')
+            response.headers['Content-Disposition'] = 'inline; filename="urlaub.ics"'
 
+        response.headers['ETag'] = etag
+        if last_modified:
+            response.headers['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, max_age=300)
 
+        return response
+
+
+class RotateFeedKeyView(LoginRequiredMixin, generic.View):
+    login_url = '/login/'
+
+    def post(self, request, *args, **kwargs):
+        request.user.rotate_feed_key()
+        messages.success(request, 'Die Kalender-Links wurden erneuert, die bisherigen Links sind ungültig.')
+        return redirect('/')
+
+
+class ExportView(LoginRequiredMixin, CheckPermissionMixin, generic.View):
+    login_url = '/login/'
+    kind = None
+
+    def get(self, request, *args, **kwargs):
+        # Vor dem Streaming prüfen: ein Fehler im Generator würde den Download nach den Headern abschneiden
+        try:
+            year = validate_year(int(request.GET['year'])) if 'year' in request.GET else date.today().year
+        except ValueError:
+            raise Http404
+
+        if self.kind == 'requests':
+            requests = Request.objects.in_range(date(year, 1, 1), date(year, 12, 31)) if 'year' in request.GET else None
+            rows = export_requests(requests)
+        else:
+            rows = export_balances(year)
 
+        response = StreamingHttpResponse(rows, content_type='text/csv; charset=utf-8')
+        response.headers['Content-Disposition'] = 'attachment; filename="%s-%s.csv"' % (self.kind, year)
 
+        return response
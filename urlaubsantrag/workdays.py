@@ -0,0 +1,53 @@
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from users.holiday_cache import get_holiday_dates as get_cached_holiday_dates
+
+
+def get_holiday_dates(province, country, first_day, last_day, fresh=False):
+    if province is None:
+        return []
+
+    holiday_dates = set()
+    for year in range(first_day.year, last_day.year + 1):
+        holiday_dates.update(get_cached_holiday_dates(country, province, year, fresh))
+
+    return workday_holidays(holiday_date for holiday_date in holiday_dates if first_day <= holiday_date <= last_day)
+
+
+def workday_holidays(holiday_dates):
+    # Nur Feiertage an Werktagen verkürzen den Urlaub, Duplikate zählen einmal
+    return sorted({holiday_date for holiday_date in holiday_dates if holiday_date.weekday() < 5})
+
+
+def count_weekdays(start_date, end_date):
+    if start_date > end_date:
+        return 0
+
+    full_weeks, remaining_days = divmod((end_date - start_date).days + 1, 7)
+    first_weekday = start_date.weekday()
+
+    weekdays = full_weeks * 5
+    for offset in range(remaining_days):
+        if (first_weekday + offset) % 7 < 5:
+            weekdays += 1
+
+    return weekdays
+
+
+# holidays muss eine sortierte Liste aus workday_holidays() sein
+def count_workdays(start_date, end_date, holidays):
+    if start_date > end_date:
+        return 0
+
+    holidays_in_range = bisect_right(holidays, end_date) - bisect_left(holidays, start_date)
+
+    return count_weekdays(start_date, end_date) - holidays_in_range
+
+
+def count_request_workdays(requests, year, holidays):
+    start_of_year = date(year, 1, 1)
+    end_of_year = date(year, 12, 31)
+
+    return sum(count_workdays(max(request.start_date, start_of_year), min(request.end_date, end_of_year), holidays)
+               for request in requests)
@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .calender_cache import bump_request
+from .models import Request, RequestStatus
+from .vacation import add_request_days, apply_balance_changes, balance_changes
+
+
+class BulkResult:
+    def __init__(self, processed, skipped, missing):
+        self.processed = processed
+        self.skipped = skipped
+        self.missing = missing
+
+
+def can_acknowledge(user):
+    # Einzeln und gesammelt gelten dieselben Rechte
+    return user.is_superuser and user.is_staff
+
+
+def apply_bulk_balance_changes(requests, new_status):
+    # Alle Anträge kommen aus NEW, pro (Benutzer, Jahr) genügt ein UPDATE
+    changes = balance_changes()
+    users = {}
+
+    for request in requests:
+        users[request.requested_by_id] = request.requested_by
+        add_request_days(changes, request.requested_by, request.start_date, request.end_date, RequestStatus.NEW, -1)
+        add_request_days(changes, request.requested_by, request.start_date, request.end_date, new_status)
+
+    apply_balance_changes(changes, users)
+
+
+def bulk_update_status(request_ids, new_status, acknowledged_by):
+    request_ids = set(request_ids)
+    modified_at = timezone.now()
+
+    with transaction.atomic():
+        # Die gesperrten Zeilen sind genau die, die dieses UPDATE ändert; parallel bearbeitete Anträge warten bzw.
+        # sind danach nicht mehr NEW und werden nicht doppelt verbucht
+        processed_ids = set(Request.objects.select_for_update().filter(
+            pk__in=request_ids, request_status=RequestStatus.NEW).values_list('pk', flat=True))
+        Request.objects.filter(pk__in=processed_ids, request_status=RequestStatus.NEW).update(
+            request_status=new_status, acknowledged_by=acknowledged_by, modified_at=modified_at)
+
+        requests = list(Request.objects.filter(pk__in=request_ids).select_related('requested_by').only(
+            'start_date', 'end_date', 'request_status', 'acknowledged_by', 'modified_at', 'requested_by__province',
+            'requested_by__country', 'requested_by__first_name', 'requested_by__last_name'))
+
+        processed = [request for request in requests if request.pk in processed_ids]
+        skipped = [request for request in requests if request.pk not in processed_ids]
+
+        apply_bulk_balance_changes(processed, new_status)
+
+    if new_status == RequestStatus.ACCEPTED:
+        for request in processed:
+            bump_request(request)
+
+    return BulkResult(processed, skipped, request_ids - {request.pk for request in requests})
@@ -1,6 +1,8 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
 
+from .user_cache import get_cached_user
+
 
 class EmailBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
@@ -15,9 +17,13 @@ class EmailBackend(ModelBackend):
             return user
 
     def get_user(self, user_id):
+        return get_cached_user(user_id, self.load_user)
+
+    def load_user(self, user_id):
         user_model = get_user_model()
 
+        # Bundesland und Abteilung werden von fast jeder Ansicht gebraucht
         try:
-            return user_model.objects.get(pk=user_id)
+            return user_model.objects.select_related('province', 'department').get(pk=user_id)
         except user_model.DoesNotExist:
             return None
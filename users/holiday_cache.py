@@ -0,0 +1,141 @@
+from collections import OrderedDict, defaultdict
+from datetime import date
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+class HolidayYear:
+    def __init__(self, names_by_date):
+        self.names = names_by_date
+        self.dates = frozenset(names_by_date)
+
+
+class HolidayCache:
+    def __init__(self, max_size=256, timeout=None):
+        self.max_size = max_size
+        # Andere Worker sehen keine Invalidierung, der Timeout begrenzt, wie lange sie veraltete Feiertage liefern
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+
+            value, expires_at = self.entries[key]
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.timeout if self.timeout is not None else None)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate_province(self, province_id):
+        with self.lock:
+            for key in [key for key in self.entries if key[1] == province_id]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_cache = HolidayCache(getattr(settings, 'HOLIDAY_CACHE_SIZE', 256), getattr(settings, 'HOLIDAY_CACHE_TIMEOUT', 300))
+
+
+def get_shared_cache():
+    # Optional: gemeinsamer Cache über mehrere Worker, z. B. FileBasedCache
+    alias = getattr(settings, 'HOLIDAY_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def province_version_key(province_id):
+    return 'holidays:version:%s' % province_id
+
+
+def shared_key(shared_cache, country, province_id, year):
+    # Eine zeitbasierte Startversion verhindert, dass nach einer Verdrängung alte Einträge wieder gültig werden
+    version = shared_cache.get_or_set(province_version_key(province_id), time.time_ns, None)
+    return 'holidays:%s:%s:%s:%s' % (country, province_id, year, version)
+
+
+def load_holiday_year(country, province_id, year):
+    from .models import StandardHoliday
+
+    names_by_date = defaultdict(list)
+    holidays = StandardHoliday.objects.filter(province_id=province_id, country=country, date__gte=date(year, 1, 1),
+                                              date__lte=date(year, 12, 31)).order_by('date', 'name')
+    for holiday_date, name in holidays.values_list('date', 'name'):
+        names_by_date[holiday_date].append(name)
+
+    return HolidayYear(dict(names_by_date))
+
+
+def get_holiday_year(country, province_id, year, fresh=False):
+    if province_id is None:
+        return HolidayYear({})
+
+    country = str(country or '')
+    key = (country, province_id, year)
+
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        cache_key = shared_key(shared_cache, *key)
+        holiday_year = shared_cache.get(cache_key)
+
+        if holiday_year is None:
+            holiday_year = load_holiday_year(*key)
+            shared_cache.set(cache_key, holiday_year, None)
+
+        return holiday_year
+
+    # Der lokale Cache sieht Änderungen anderer Worker erst nach dem Timeout; was dauerhaft gespeichert wird
+    # (fresh), liest deshalb ohne gemeinsamen Cache direkt aus der Datenbank
+    if fresh:
+        return load_holiday_year(*key)
+
+    holiday_year = local_cache.get(key)
+    if holiday_year is None:
+        holiday_year = load_holiday_year(*key)
+        local_cache.set(key, holiday_year)
+
+    return holiday_year
+
+
+def get_holiday_dates(country, province_id, year, fresh=False):
+    return get_holiday_year(country, province_id, year, fresh).dates
+
+
+def get_holiday_names(country, province_id, year):
+    return get_holiday_year(country, province_id, year).names
+
+
+def invalidate_province_holidays(province_id):
+    # Sofort, damit die laufende Transaktion neu lädt, und nach dem Commit noch einmal, damit keine
+    # zwischenzeitlich von einer anderen Anfrage gecachten alten Feiertage gültig bleiben
+    invalidate_province_version(province_id)
+    transaction.on_commit(lambda: invalidate_province_version(province_id))
+
+
+def invalidate_province_version(province_id):
+    local_cache.invalidate_province(province_id)
+
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        try:
+            shared_cache.incr(province_version_key(province_id))
+        except ValueError:
+            shared_cache.set(province_version_key(province_id), time.time_ns(), None)
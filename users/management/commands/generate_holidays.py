@@ -1,52 +1,160 @@
-from users.models import Province, StandardHoliday
+from users.models import Province, StandardHoliday, holidays_changed
 import holidays
-from django.core.management.base import BaseCommand
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+
+subdivision_mapping = {
+    'DE': {
+        'BW': ('BW', 'Baden-Württemberg'),
+        'BY': ('BY', 'Bayern'),
+        'BE': ('BE', 'Berlin'),
+        'BB': ('BB', 'Brandenburg'),
+        'HB': ('HB', 'Bremen'),
+        'HH': ('HH', 'Hamburg'),
+        'HE': ('HE', 'Hessen'),
+        'MV': ('MV', 'Mecklenburg-Vorpommern'),
+        'NI': ('NI', 'Niedersachsen'),
+        'NW': ('NW', 'Nordrhein-Westfalen'),
+        'RP': ('RP', 'Rheinland-Pfalz'),
+        'SL': ('SL', 'Saarland'),
+        'SN': ('SN', 'Sachsen'),
+        'ST': ('ST', 'Sachsen-Anhalt'),
+        'SH': ('SH', 'Schleswig-Holstein'),
+        'TH': ('TH', 'Thüringen'),
+    },
+    'AT': {
+        '1': ('B', 'Burgenland'),
+        '2': ('K', 'Kärnten'),
+        '3': ('NÖ', 'Niederösterreich'),
+        '4': ('OÖ', 'Oberösterreich'),
+        '5': ('S', 'Salzburg'),
+        '6': ('ST', 'Steiermark'),
+        '7': ('T', 'Tirol'),
+        '8': ('V', 'Vorarlberg'),
+        '9': ('W', 'Wien'),
+    },
+    'CH': {
+        'AG': ('AG', 'Aargau'),
+        'AR': ('AR', 'Appenzell Ausserrhoden'),
+        'AI': ('AI', 'Appenzell Innerrhoden'),
+        'BL': ('BL', 'Basel-Landschaft'),
+        'BS': ('BS', 'Basel-Stadt'),
+        'BE': ('BE', 'Bern'),
+        'FR': ('FR', 'Freiburg'),
+        'GE': ('GE', 'Genf'),
+        'GL': ('GL', 'Glarus'),
+        'GR': ('GR', 'Graubünden'),
+        'JU': ('JU', 'Jura'),
+        'LU': ('LU', 'Luzern'),
+        'NE': ('NE', 'Neuenburg'),
+        'NW': ('NW', 'Nidwalden'),
+        'OW': ('OW', 'Obwalden'),
+        'SG': ('SG', 'St. Gallen'),
+        'SH': ('SH', 'Schaffhausen'),
+        'SZ': ('SZ', 'Schwyz'),
+        'SO': ('SO', 'Solothurn'),
+        'TG': ('TG', 'Thurgau'),
+        'TI': ('TI', 'Tessin'),
+        'UR': ('UR', 'Uri'),
+        'VD': ('VD', 'Waadt'),
+        'VS': ('VS', 'Wallis'),
+        'ZG': ('ZG', 'Zug'),
+        'ZH': ('ZH', 'Zürich'),
+    },
+}
+
+
+def parse_years(value):
+    try:
+        if '-' in value:
+            first_year, last_year = value.split('-', 1)
+            return range(int(first_year), int(last_year) + 1)
+
+        return range(int(value), int(value) + 1)
+    except ValueError:
+        raise CommandError("--years must be a year or a range like 1990-2049")
 
 
 class Command(BaseCommand):
-    help = "Generates Holidays from 1990 to 2050"
+    help = "Generates the holidays of all provinces, by default from 1990 to 2049 for Germany"
 
     def add_arguments(self, parser):
-        pass
+        parser.add_argument('--years', default='1990-2049', help="A year or a range like 1990-2049")
+        parser.add_argument('--countries', nargs='+', default=['DE'], choices=sorted(subdivision_mapping))
+        parser.add_argument('--replace', action='store_true',
+                            help="Replace the existing holidays in the range instead of skipping them")
+        parser.add_argument('--batch-size', type=int, default=1000)
 
     def handle(self, *args, **options):
-        german_states = [
-            'BW', 'BY', 'BE', 'BB', 'HB', 'HH', 'HE', 'MV',
-            'NI', 'NW', 'RP', 'SL', 'SN', 'ST', 'SH', 'TH'
+        years = parse_years(options['years'])
+        start = time.perf_counter()
+        total_created = 0
+
+        for country in options['countries']:
+            provinces_created = holidays_created = holidays_skipped = 0
+
+            for subdivision, (abbreviation, name) in subdivision_mapping[country].items():
+                province, province_created = self.get_province(country, abbreviation, name)
+
+                country_holidays = holidays.country_holidays(country, subdiv=subdivision, years=years, language='de')
+
+                with transaction.atomic():
+                    created, skipped = self.store_holidays(province, country_holidays, years, options)
+
+                    if created or options['replace']:
+                        holidays_changed.send(sender=StandardHoliday, province=province, years=years)
+
+                provinces_created += province_created
+                holidays_created += created
+                holidays_skipped += skipped
+
+            total_created += holidays_created
+
+            self.stdout.write("%s: %s provinces (%s new), %s holidays created, %s already existed" % (
+                country, len(subdivision_mapping[country]), provinces_created, holidays_created, holidays_skipped))
+
+        self.stdout.write(self.style.SUCCESS("Generated %s holidays for %s-%s in %.1fs" % (
+            total_created, years[0], years[-1], time.perf_counter() - start)))
+
+    def get_province(self, country, abbreviation, name):
+        province = Province.objects.filter(country=country, state_abreviation=abbreviation).order_by('pk').first()
+
+        if province is not None:
+            return province, False
+
+        return Province.objects.create(country=country, state_abreviation=abbreviation, name=name), True
+
+    def store_holidays(self, province, country_holidays, years, options):
+        existing_holidays = StandardHoliday.objects.filter(province=province, date__year__gte=years[0],
+                                                           date__year__lte=years[-1])
+
+        if options['replace']:
+            self.delete_holidays(province, years)
+            existing = set()
+        else:
+            existing = set(existing_holidays.values_list('date', 'name'))
+
+        new_holidays = [
+            StandardHoliday(name=name, country=province.country, date=holiday_date, province=province)
+            for holiday_date, name in sorted(country_holidays.items())
+            if (holiday_date, name) not in existing
         ]
 
-        german_state_mapping = {
-            'BW': 'Baden-Württemberg',
-            'BY': 'Bayern',
-            'BE': 'Berlin',
-            'BB': 'Brandenburg',
-            'HB': 'Bremen',
-            'HH': 'Hamburg',
-            'HE': 'Hessen',
-            'MV': 'Mecklenburg-Vorpommern',
-            'NI': 'Niedersachsen',
-            'NW': 'Nordrhein-Westfalen',
-            'RP': 'Rheinland-Pfalz',
-            'SL': 'Saarland',
-            'SN': 'Sachsen',
-            'ST': 'Sachsen-Anhalt',
-            'SH': 'Schleswig-Holstein',
-            'TH': 'Thüringen'
-        }
-
-        for state in german_states:
-            new_state = Province(country='DE', state_abreviation=state, name=german_state_mapping[state])
-            new_state.save()
-
-            output_line = "Generated" + new_state.name
-
-            self.stdout.write(output_line)
-
-            for holiday_date, name in sorted(holidays.Germany(years=range(1990, 2050), prov=state, language='de').items()):
-                new_holiday = StandardHoliday(name=name, country='DE', date=holiday_date,
-                                              province=Province.objects.get(state_abreviation=state))
-                new_holiday.save()
-
-                output_line_loop = "Generated" + new_holiday.name
-
-                self.stdout.write(output_line_loop)
+        StandardHoliday.objects.bulk_create(new_holidays, batch_size=options['batch_size'])
+
+        return len(new_holidays), len(country_holidays) - len(new_holidays)
+
+    def delete_holidays(self, province, years):
+        # Ein DELETE ohne pre/post_delete pro Zeile; Caches und Bilanzen folgen dem einen holidays_changed-Signal
+        quote_name = connection.ops.quote_name
+        date_column = quote_name(StandardHoliday._meta.get_field('date').column)
+
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s WHERE %s = %%s AND %s >= %%s AND %s <= %%s' % (
+                quote_name(StandardHoliday._meta.db_table),
+                quote_name(StandardHoliday._meta.get_field('province').column), date_column, date_column,
+            ), [province.pk, connection.ops.adapt_datefield_value(date(years[0], 1, 1)),
+                connection.ops.adapt_datefield_value(date(years[-1], 12, 31))])
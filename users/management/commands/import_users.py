@@ -0,0 +1,232 @@
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import time
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from users.models import CustomUser, Department, Province, users_imported
+from users.user_cache import invalidate_user
+
+
+required_columns = ['first_name', 'last_name', 'email']
+
+# Optionale Spalten und die Felder, die sie beim Aktualisieren überschreiben
+column_fields = {
+    'abbreviation': 'abbreviation',
+    'staff_nr': 'staff_nr',
+    'department': 'department',
+    'province': 'province',
+    'country': 'country',
+    'entitlement': 'vacation_entitlement',
+}
+
+# Felder, die im Kalender angezeigt werden bzw. dessen Abteilungsfilter bestimmen
+calender_fields = ['abbreviation', 'first_name', 'last_name', 'department_id']
+
+
+def init_worker():
+    # Mit "spawn" (macOS, Windows) kennt der Worker-Prozess die Einstellungen noch nicht
+    django.setup()
+
+
+def chunks(items, size):
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
+
+class Command(BaseCommand):
+    help = "Imports employees from a CSV file (first_name, last_name, email, abbreviation, staff_nr, department, " \
+           "province, entitlement, password, country)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--delimiter', default=',')
+        parser.add_argument('--update', action='store_true', help="Update users whose email already exists")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and report without writing")
+        parser.add_argument('--create-departments', action='store_true')
+        parser.add_argument('--country', default='DE', help="Country of rows without a country column")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=None, help="Processes for password hashing")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        columns, rows = self.read_rows(options)
+        update_fields = ['first_name', 'last_name', 'modified_at'] + [field for column, field in column_fields.items()
+                                                                      if column in columns]
+        if 'province' in columns and 'country' not in columns:
+            # Das Bundesland wird im Land des Benutzers bzw. im Standardland gesucht
+            update_fields.append('country')
+
+        departments = {department.name.lower(): department for department in Department.objects.all()}
+        provinces = {}
+        for province in Province.objects.all():
+            provinces.setdefault((str(province.country), province.state_abreviation.lower()), province)
+            provinces.setdefault((str(province.country), province.name.lower()), province)
+
+        missing_departments = sorted({row['department'] for row in rows if row.get('department') and
+                                      row['department'].lower() not in departments})
+        if missing_departments and not options['create_departments']:
+            raise CommandError("Unknown departments: %s (use --create-departments)" % ', '.join(missing_departments))
+
+        if missing_departments and not options['dry_run']:
+            Department.objects.bulk_create(Department(name=name) for name in missing_departments)
+            departments = {department.name.lower(): department for department in Department.objects.all()}
+
+        # normalize_email setzt nur die Domain in Kleinbuchstaben, verglichen wird ohne Groß-/Kleinschreibung
+        existing = self.get_existing(rows)
+
+        users, errors = self.build_users(rows, columns, departments, provinces, existing, options)
+        if errors:
+            raise CommandError("%s invalid row(s):\n%s" % (len(errors), '\n'.join(errors)))
+
+        new_users = [user for user in users if user.email.lower() not in existing]
+        updated_users = [user for user in users if user.email.lower() in existing] if options['update'] else []
+        skipped = len(users) - len(new_users) - len(updated_users)
+
+        if options['dry_run']:
+            self.stdout.write("Dry run: %s would be created, %s updated, %s skipped, %s new department(s)" % (
+                len(new_users), len(updated_users), skipped, len(missing_departments)))
+            return
+
+        self.hash_passwords(new_users + updated_users, options['workers'])
+        for user in new_users:
+            if user.raw_password is None:
+                user.set_unusable_password()
+
+        for batch in chunks(new_users, options['batch_size']):
+            with transaction.atomic():
+                CustomUser.objects.bulk_create(batch)
+
+        # bulk_update wertet auto_now nicht aus, modified_at versioniert die Kalender-ETags
+        modified_at = timezone.now()
+        for user in updated_users:
+            user.modified_at = modified_at
+
+        for batch in chunks(updated_users, options['batch_size']):
+            # Bestehende Passwörter bleiben erhalten, wenn die Zeile keines enthält
+            with transaction.atomic():
+                CustomUser.objects.bulk_update([user for user in batch if user.raw_password is None], update_fields)
+                CustomUser.objects.bulk_update([user for user in batch if user.raw_password is not None],
+                                               update_fields + ['password'])
+
+            for user in batch:
+                invalidate_user(user.pk)
+
+        # bulk_create und bulk_update senden kein post_save, Bilanzen und Kalender werden gesammelt nachgezogen
+        moved = [user for user in updated_users if (existing[user.email.lower()].province_id,
+                                                    str(existing[user.email.lower()].country or ''))
+                 != (user.province_id, str(user.country or ''))]
+        renamed = [user for user in updated_users
+                   if [getattr(existing[user.email.lower()], field) for field in calender_fields]
+                   != [getattr(user, field) for field in calender_fields]]
+        if moved or renamed:
+            users_imported.send(sender=CustomUser, users=moved, calender_users=renamed)
+
+        self.stdout.write(self.style.SUCCESS("Imported %s users (%s created, %s updated, %s skipped) in %.1fs" % (
+            len(new_users) + len(updated_users), len(new_users), len(updated_users), skipped,
+            time.perf_counter() - start)))
+
+    def read_rows(self, options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as csv_file:
+                reader = csv.DictReader(csv_file, delimiter=options['delimiter'])
+                missing = [column for column in required_columns if column not in (reader.fieldnames or [])]
+                if missing:
+                    raise CommandError("Missing columns: %s" % ', '.join(missing))
+
+                return set(reader.fieldnames), [{key: (value or '').strip() for key, value in row.items() if key}
+                                                for row in reader]
+        except OSError as error:
+            raise CommandError(error)
+
+    def build_users(self, rows, columns, departments, provinces, existing, options):
+        users = []
+        errors = []
+        emails = set()
+
+        for line, row in enumerate(rows, start=2):
+            email = CustomUser.objects.normalize_email(row['email'])
+            previous = existing.get(email.lower()) if options['update'] else None
+
+            if previous is not None:
+                # Fehlende Spalten behalten die gespeicherten Werte
+                user = CustomUser(pk=previous.pk, email=previous.email, abbreviation=previous.abbreviation,
+                                  staff_nr=previous.staff_nr, department_id=previous.department_id,
+                                  province_id=previous.province_id, country=previous.country,
+                                  vacation_entitlement=previous.vacation_entitlement)
+            else:
+                user = CustomUser(email=email, country=options['country'])
+
+            user.first_name = row['first_name']
+            user.last_name = row['last_name']
+
+            for column in ['abbreviation', 'staff_nr', 'country']:
+                if column in columns and (row[column] or column != 'country'):
+                    setattr(user, column, row[column])
+
+            if 'department' in columns:
+                user.department = departments.get(row['department'].lower())
+
+            if 'province' in columns:
+                user.country = user.country or options['country']
+                user.province = provinces.get((str(user.country or ''), row['province'].lower()))
+
+                if row['province'] and user.province is None:
+                    errors.append("Line %s: unknown province %r for %s" % (line, row['province'], user.country))
+                    continue
+
+            if 'entitlement' in columns and row['entitlement']:
+                try:
+                    user.vacation_entitlement = int(row['entitlement'])
+                except ValueError:
+                    errors.append("Line %s: invalid entitlement %r" % (line, row['entitlement']))
+                    continue
+
+            if email.lower() in emails:
+                errors.append("Line %s: duplicate email %s" % (line, email))
+                continue
+            emails.add(email.lower())
+
+            # Das Passwort wird erst nach der Prüfung aller Zeilen gehasht
+            user.raw_password = row.get('password') or None
+
+            # Abteilung und Bundesland sind bereits aufgelöst, die Prüfung würde pro Zeile abfragen
+            try:
+                user.full_clean(exclude=['password', 'department', 'province'], validate_unique=False)
+            except ValidationError as error:
+                errors.append("Line %s: %s" % (line, '; '.join('%s: %s' % (field, ' '.join(messages))
+                                                              for field, messages in error.message_dict.items())))
+                continue
+
+            users.append(user)
+
+        return users, errors
+
+    def get_existing(self, rows):
+        existing = {}
+        emails = [CustomUser.objects.normalize_email(row['email']).lower() for row in rows]
+
+        for batch in chunks(emails, 500):
+            users = CustomUser.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=batch)
+            for user in users.only('email', 'first_name', 'last_name', *column_fields.values()):
+                existing[user.email_lower] = user
+
+        return existing
+
+    def hash_passwords(self, users, workers):
+        with_password = [user for user in users if user.raw_password is not None]
+        if not with_password:
+            return
+
+        # make_password ist absichtlich langsam, die Prozesse nutzen alle Kerne
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            hashes = executor.map(make_password, [user.raw_password for user in with_password], chunksize=50)
+
+            for user, password in zip(with_password, hashes):
+                user.password = password
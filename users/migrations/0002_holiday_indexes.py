@@ -0,0 +1,34 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:21
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_holidays(apps, schema_editor):
+    standard_holiday = apps.get_model('users', 'StandardHoliday')
+
+    duplicates = standard_holiday.objects.values('province', 'date', 'name').annotate(
+        first_id=Min('id'), count=Count('id')).filter(count__gt=1)
+
+    for duplicate in duplicates:
+        standard_holiday.objects.filter(province=duplicate['province'], date=duplicate['date'],
+                                        name=duplicate['name']).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='standardholiday',
+            index=models.Index(fields=['province', 'country', 'date'], name='holiday_province_date_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_holidays, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='standardholiday',
+            constraint=models.UniqueConstraint(fields=('province', 'date', 'name'), name='unique_holiday_per_province'),
+        ),
+    ]
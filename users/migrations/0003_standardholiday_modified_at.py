@@ -0,0 +1,20 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_holiday_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='standardholiday',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:57
+
+import secrets
+
+from django.db import migrations, models
+import users.models
+
+
+def generate_feed_keys(apps, schema_editor):
+    # AddField setzt den Standardwert nur einmal für alle bestehenden Zeilen
+    custom_user = apps.get_model('users', 'CustomUser')
+
+    users = list(custom_user.objects.only('pk'))
+    for user in users:
+        user.feed_key = secrets.token_hex(16)
+
+    custom_user.objects.bulk_update(users, ['feed_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_standardholiday_modified_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='feed_key',
+            field=models.CharField(default=users.models.generate_feed_key, editable=False, max_length=32),
+        ),
+        migrations.RunPython(generate_feed_keys, migrations.RunPython.noop),
+    ]
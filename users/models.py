@@ -1,12 +1,15 @@
 from django.db import models
 import datetime
+import secrets
 from django.conf import settings
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin, User, AbstractUser
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import FileExtensionValidator, ValidationError, MaxValueValidator, MinValueValidator, RegexValidator
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver, Signal
 from django_countries.fields import CountryField
+from .holiday_cache import invalidate_province_holidays
+from .user_cache import invalidate_all_users, invalidate_user
 from django.db import models
 
 
@@ -37,6 +40,14 @@ class Province(models.Model):
         return '%s' % self.name
 
 
+# Wird bei Massenänderungen gesendet, die keine post_save-Signale auslösen (province, years)
+holidays_changed = Signal()
+
+# Wird nach Massenimporten gesendet: users mit geändertem Bundesland, calender_users mit geändertem Kürzel,
+# Namen oder Abteilung
+users_imported = Signal()
+
+
 class StandardHoliday(models.Model):
     id = models.BigAutoField(primary_key=True)
     name = models.CharField(max_length=255)
@@ -46,6 +57,16 @@ class StandardHoliday(models.Model):
 
     date = models.DateField(blank=False, null=False)
 
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['province', 'country', 'date'], name='holiday_province_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['province', 'date', 'name'], name='unique_holiday_per_province'),
+        ]
+
     def __str__(self):
         return '%s | %s' % (self.name, self.date)
 
@@ -69,6 +90,10 @@ class EmployeeAdministrationLevel(models.TextChoices):
     ADMIN = 'ADM', _('Administration')
 
 
+def generate_feed_key():
+    return secrets.token_hex(16)
+
+
 class CustomUser(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True)
     first_name = models.CharField(max_length=30)
@@ -93,6 +118,12 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     vacation_entitlement = models.PositiveSmallIntegerField(default=24, validators=[MinValueValidator(20), MaxValueValidator(365)])
     manual_vacation_correction = models.IntegerField(default=0)
 
+    # Teil der signierten Kalender-Feed-URLs, ein neuer Schlüssel macht alle bisherigen URLs ungültig
+    feed_key = models.CharField(max_length=32, default=generate_feed_key, editable=False)
+
+    # Versioniert Kalender-ETags, die Kürzel und Namen anzeigen; save(update_fields=...) ohne das Feld lässt es stehen
+    modified_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return self.email
 
@@ -102,3 +133,51 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     def get_absolute_url(self):
         return f"/"
+
+    def rotate_feed_key(self):
+        self.feed_key = generate_feed_key()
+        self.save(update_fields=['feed_key'])
+
+
+# Einzige Abfrage des alten Stands, die Receiver in urlaubsantrag.signals nutzen ihn mit
+@receiver(pre_save, sender=StandardHoliday)
+def remember_previous_holiday(sender, instance, **kwargs):
+    instance._previous_holiday = None
+
+    if instance.pk is not None:
+        instance._previous_holiday = StandardHoliday.objects.filter(pk=instance.pk).values_list('province_id', 'date').first()
+
+
+@receiver(post_save, sender=StandardHoliday)
+@receiver(post_delete, sender=StandardHoliday)
+def invalidate_holiday_cache(sender, instance, **kwargs):
+    invalidate_province_holidays(instance.province_id)
+
+    previous_holiday = getattr(instance, '_previous_holiday', None)
+    if previous_holiday is not None and previous_holiday[0] != instance.province_id:
+        invalidate_province_holidays(previous_holiday[0])
+
+
+@receiver(post_save, sender=Province)
+@receiver(post_delete, sender=Province)
+def invalidate_province_holiday_cache(sender, instance, **kwargs):
+    invalidate_province_holidays(instance.pk)
+
+
+@receiver(holidays_changed)
+def invalidate_generated_holidays(sender, province, **kwargs):
+    invalidate_province_holidays(province.pk)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=Province)
+@receiver(post_delete, sender=Province)
+def invalidate_cached_users(sender, instance, **kwargs):
+    invalidate_all_users()
@@ -1,3 +1,226 @@
-from django.test import TestCase
+from datetime import date
+from io import StringIO
+import os
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .backends import EmailBackend
+from .holiday_cache import HolidayCache, HolidayYear, get_holiday_dates, get_holiday_names, local_cache
+from .models import CustomUser, Department, Province, StandardHoliday
+from urlaubsantrag.calender_cache import render_calender_months
+from urlaubsantrag.models import Request, RequestStatus
+
+
+class GenerateHolidaysTestCase(TestCase):
+    def test_generation_is_idempotent(self):
+        call_command('generate_holidays', years='2024-2025', countries=['DE', 'AT'], stdout=StringIO())
+        holiday_count = StandardHoliday.objects.count()
+
+        self.assertEqual(Province.objects.count(), 16 + 9)
+        self.assertTrue(StandardHoliday.objects.filter(province__name='Wien', date='2024-12-08').exists())
+
+        call_command('generate_holidays', years='2024-2025', countries=['DE', 'AT'], stdout=StringIO())
+
+        self.assertEqual(Province.objects.count(), 16 + 9)
+        self.assertEqual(StandardHoliday.objects.count(), holiday_count)
+
+    def test_replace(self):
+        call_command('generate_holidays', years='2023-2024', stdout=StringIO())
+        StandardHoliday.objects.filter(province__state_abreviation='BY').update(name='Falsch')
+
+        # Ein DELETE pro Bundesland statt Signalen pro Feiertag
+        with CaptureQueriesContext(connection) as queries:
+            call_command('generate_holidays', years='2024', replace=True, stdout=StringIO())
+        self.assertLess(len(queries), 16 * 10)
+
+        # Nur das ersetzte Jahr wird gelöscht
+        self.assertFalse(StandardHoliday.objects.filter(name='Falsch', date__year=2024).exists())
+        self.assertTrue(StandardHoliday.objects.filter(name='Falsch', date__year=2023).exists())
+
+
+class HolidayCacheTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.province = Province.objects.create(name='Bayern', state_abreviation='BY', country='DE')
+        StandardHoliday.objects.create(name='Neujahr', country='DE', province=cls.province, date=date(2024, 1, 1))
+
+    def setUp(self):
+        local_cache.clear()
+
+    def test_lookup_is_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_holiday_dates('DE', self.province.pk, 2024), frozenset([date(2024, 1, 1)]))
+            self.assertEqual(get_holiday_names('DE', self.province.pk, 2024), {date(2024, 1, 1): ['Neujahr']})
+
+    def test_changes_invalidate_cache(self):
+        get_holiday_dates('DE', self.province.pk, 2024)
+
+        holiday = StandardHoliday.objects.create(name='Heilige Drei Könige', country='DE', province=self.province,
+                                                 date=date(2024, 1, 6))
+        self.assertIn(date(2024, 1, 6), get_holiday_dates('DE', self.province.pk, 2024))
+
+        holiday.delete()
+        self.assertNotIn(date(2024, 1, 6), get_holiday_dates('DE', self.province.pk, 2024))
+
+    def test_invalidation_is_repeated_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            StandardHoliday.objects.create(name='Heilige Drei Könige', country='DE', province=self.province,
+                                           date=date(2024, 1, 6))
+            # Ein paralleler Leser cacht noch den Stand vor dem Commit
+            local_cache.set(('DE', self.province.pk, 2024), HolidayYear({date(2024, 1, 1): ['Neujahr']}))
+
+        self.assertTrue(callbacks)
+        self.assertIn(date(2024, 1, 6), get_holiday_dates('DE', self.province.pk, 2024))
+
+    def test_entries_expire(self):
+        cache = HolidayCache(timeout=60)
+        cache.set(('DE', 1, 2024), 'a')
+        self.assertEqual(cache.get(('DE', 1, 2024)), 'a')
+
+        with mock.patch('users.holiday_cache.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get(('DE', 1, 2024)))
+
+    def test_lru_eviction(self):
+        cache = HolidayCache(max_size=2)
+        cache.set(('DE', 1, 2024), 'a')
+        cache.set(('DE', 1, 2025), 'b')
+        cache.get(('DE', 1, 2024))
+        cache.set(('DE', 1, 2026), 'c')
+
+        self.assertEqual(cache.get(('DE', 1, 2024)), 'a')
+        self.assertIsNone(cache.get(('DE', 1, 2025)))
+
+    @override_settings(HOLIDAY_CACHE_ALIAS='default')
+    def test_shared_cache(self):
+        get_holiday_dates('DE', self.province.pk, 2024)
+
+        with self.assertNumQueries(0):
+            get_holiday_dates('DE', self.province.pk, 2024)
+
+        StandardHoliday.objects.create(name='Heilige Drei Könige', country='DE', province=self.province,
+                                       date=date(2024, 1, 6))
+        self.assertIn(date(2024, 1, 6), get_holiday_dates('DE', self.province.pk, 2024))
+
+
+class EmailBackendTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.province = Province.objects.create(name='Bayern', state_abreviation='BY', country='DE')
+        cls.department = Department.objects.create(name='IT')
+        cls.user = CustomUser.objects.create_user(email='max@example.com', first_name='Max', last_name='Muster',
+                                                  province=cls.province, department=cls.department)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_user_is_loaded_with_relations(self):
+        with self.assertNumQueries(1):
+            user = EmailBackend().get_user(self.user.pk)
+            self.assertEqual((user.province.name, user.department.name), ('Bayern', 'IT'))
+
+        self.assertIsNone(EmailBackend().get_user(0))
+
+    @override_settings(USER_CACHE_ALIAS='default')
+    def test_cached_user_is_invalidated(self):
+        EmailBackend().get_user(self.user.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(EmailBackend().get_user(self.user.pk).department.name, 'IT')
+
+        self.user.first_name = 'Moritz'
+        self.user.save()
+        self.assertEqual(EmailBackend().get_user(self.user.pk).first_name, 'Moritz')
+
+        self.department.name = 'Einkauf'
+        self.department.save()
+        self.assertEqual(EmailBackend().get_user(self.user.pk).department.name, 'Einkauf')
+
+
+class ImportUsersTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.bavaria = Province.objects.create(name='Bayern', state_abreviation='BY', country='DE')
+        cls.berlin = Province.objects.create(name='Berlin', state_abreviation='BE', country='DE')
+        cls.department = Department.objects.create(name='IT')
+        cls.user = CustomUser.objects.create_user(email='max@example.com', password='geheim', first_name='Max',
+                                                  last_name='Muster', province=cls.bavaria, department=cls.department)
+
+    def write_csv(self, lines, header='first_name,last_name,email,abbreviation,staff_nr,department,province,entitlement,password'):
+        path = os.path.join(self.directory.name, 'users.csv')
+        with open(path, 'w', encoding='utf-8') as csv_file:
+            csv_file.write(header + '\n')
+            csv_file.write('\n'.join(lines) + '\n')
+        return path
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_import_creates_and_skips_existing(self):
+        path = self.write_csv(['Erika,Muster,erika@EXAMPLE.com,EM,1001,it,BY,30,passwort',
+                               'Max,Muster,max@example.com,MM,1000,IT,Berlin,24,'])
+
+        call_command('import_users', path, '--workers', '1', stdout=StringIO())
+
+        erika = CustomUser.objects.get(email='erika@example.com')
+        self.assertEqual((erika.department, erika.province, erika.vacation_entitlement), (self.department, self.bavaria, 30))
+        self.assertTrue(erika.check_password('passwort'))
+        self.assertEqual(CustomUser.objects.get(pk=self.user.pk).province, self.bavaria)
+
+    def test_update_keeps_password_and_dry_run_writes_nothing(self):
+        path = self.write_csv(['Max,Meier,max@example.com,MM,1000,Vertrieb,BE,28,'])
+
+        with self.assertRaises(CommandError):
+            call_command('import_users', path, '--update', stdout=StringIO())
+
+        out = StringIO()
+        call_command('import_users', path, '--update', '--create-departments', '--dry-run', stdout=out)
+        self.assertIn('1 updated', out.getvalue())
+        self.assertFalse(Department.objects.filter(name='Vertrieb').exists())
+
+        call_command('import_users', path, '--update', '--create-departments', stdout=StringIO())
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual((user.last_name, user.province, user.department.name), ('Meier', self.berlin, 'Vertrieb'))
+        self.assertTrue(user.check_password('geheim'))
+
+    def test_update_only_overwrites_given_columns(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(vacation_entitlement=30, abbreviation='MM', staff_nr='1000')
+        path = self.write_csv(['Max,Meier,MAX@example.com'], header='first_name,last_name,email')
+
+        out = StringIO()
+        call_command('import_users', path, '--update', stdout=out)
+        self.assertIn('1 updated', out.getvalue())
+
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual(CustomUser.objects.count(), 1)
+        self.assertEqual((user.email, user.last_name, user.vacation_entitlement, user.abbreviation, user.department,
+                          user.province), ('max@example.com', 'Meier', 30, 'MM', self.department, self.bavaria))
+
+    @override_settings(CALENDER_CACHE_ALIAS='default')
+    def test_update_refreshes_calender_months(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(abbreviation='MM', staff_nr='1000')
+        Request.objects.create(requested_by=self.user, start_date=date(2024, 4, 2), end_date=date(2024, 4, 3),
+                               request_status=RequestStatus.ACCEPTED)
+        self.assertNotIn('XY', render_calender_months(2024, months=[4])[0]["html"])
+
+        path = self.write_csv(['Max,Muster,max@example.com,XY'], header='first_name,last_name,email,abbreviation')
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_users', path, '--update', stdout=StringIO())
+
+        self.assertIn('XY', render_calender_months(2024, months=[4])[0]["html"])
+
+    def test_invalid_rows_abort_import(self):
+        path = self.write_csv(['Erika,Muster,erika@example.com,EMXX,1001,IT,BY,30,',
+                               'Otto,Muster,otto@example.com,OM,1002,IT,Hessen,30,'])
+
+        with self.assertRaisesMessage(CommandError, '2 invalid row(s)'):
+            call_command('import_users', path, stdout=StringIO())
+
+        self.assertEqual(CustomUser.objects.count(), 1)
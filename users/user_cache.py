@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+version_key = 'users:version'
+
+
+def get_user_cache():
+    # Optional, z. B. ein gemeinsamer Cache für alle Worker; ohne Alias wird jede Anfrage aus der Datenbank geladen
+    alias = getattr(settings, 'USER_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def user_key(user_cache, user_id):
+    # Änderungen an Abteilungen und Bundesländern betreffen viele Benutzer und erhöhen nur die gemeinsame Version
+    version = user_cache.get_or_set(version_key, time.time_ns, None)
+    return 'users:user:%s:%s' % (user_id, version)
+
+
+def get_cached_user(user_id, load_user):
+    user_cache = get_user_cache()
+    if user_cache is None:
+        return load_user(user_id)
+
+    key = user_key(user_cache, user_id)
+    user = user_cache.get(key)
+
+    if user is None:
+        user = load_user(user_id)
+
+        if user is not None:
+            user_cache.set(key, user, getattr(settings, 'USER_CACHE_TIMEOUT', 300))
+
+    return user
+
+
+def invalidate_user(user_id):
+    user_cache = get_user_cache()
+    if user_cache is not None:
+        user_cache.delete(user_key(user_cache, user_id))
+
+
+def invalidate_all_users():
+    user_cache = get_user_cache()
+    if user_cache is None:
+        return
+
+    try:
+        user_cache.incr(version_key)
+    except ValueError:
+        user_cache.set(version_key, time.time_ns(), None)